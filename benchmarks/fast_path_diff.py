@@ -0,0 +1,67 @@
+# benchmarks/fast_path_diff.py
+"""
+Test différentiel de l'allocateur rapide contre le MILP (CBC).
+
+    python -m benchmarks.fast_path_diff [nb_marchés]
+
+Tire des marchés aléatoires (mono-produit, MOQ globale non liante, et
+quelconques), compare le chiffre d'affaires de fast_solve à celui de
+solve_model(fast_path=False) et sort en erreur au premier écart.
+"""
+import random
+import sys
+from core.allocation_algo import solve_model
+from core.fast_path import fast_solve
+
+
+def random_market(rng):
+    nb_products = rng.choice([1, 1, 2, 3])
+    products = []
+    for j in range(nb_products):
+        volume_multiple = rng.choice([1, 5, 10, 20])
+        products.append({
+            "id": f"P{j}",
+            "stock": volume_multiple * rng.randint(3, 40),
+            "volume_multiple": volume_multiple,
+            "seller_moq": volume_multiple * rng.randint(1, 5),
+        })
+
+    buyers = []
+    for i in range(rng.randint(1, 8)):
+        bids = {}
+        for p in products:
+            if rng.random() < 0.7:
+                bids[p["id"]] = {
+                    "qty_desired": p["volume_multiple"] * rng.randint(1, 30),
+                    "current_price": round(rng.uniform(1, 20), 2),
+                    "max_price": 25.0,
+                    "moq": p["seller_moq"],
+                }
+        if bids:
+            buyers.append({"name": f"B{i}", "auto_bid": True, "products": bids})
+
+    seller_global_moq = rng.choice([0, 20, 50, 80, 150])
+    return buyers, products, seller_global_moq
+
+
+def main(nb_markets=500):
+    rng = random.Random(0)
+    checked = 0
+    for k in range(nb_markets):
+        buyers, products, seller_global_moq = random_market(rng)
+        fast = fast_solve(buyers, products, seller_global_moq)
+        if fast is None:
+            continue
+
+        checked += 1
+        _, milp_ca = solve_model(buyers, products, seller_global_moq, fast_path=False)
+        if abs(fast[1] - milp_ca) > 1e-6:
+            print(f"Écart sur le marché {k} : rapide={fast[1]:.2f} MILP={milp_ca:.2f}")
+            return 1
+
+    print(f"{checked}/{nb_markets} marchés pris en charge par le chemin rapide, aucun écart avec CBC")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,70 @@
+# benchmarks/market_generator.py
+"""
+Générateur de marchés synthétiques reproductibles (graine fixe).
+
+Les produits reprennent les ordres de grandeur de data/products.json
+(stock 250-1000, volume_multiple 10/20/100, MOQ de 2 à 5 multiples,
+prix de départ 5-20 €) ; les acheteurs enchérissent sur une partie des
+produits autour du prix de départ, avec une marge jusqu'au prix max.
+"""
+import random
+
+VOLUME_MULTIPLES = (10, 10, 20, 20, 100)
+
+
+def generate_products(nb_products, rng, lot_id="lot_bench"):
+    products = []
+    for j in range(nb_products):
+        volume_multiple = rng.choice(VOLUME_MULTIPLES)
+        stock = volume_multiple * rng.randint(max(3, 250 // volume_multiple), 1000 // volume_multiple)
+        products.append({
+            "id": f"P{j + 1}",
+            "name": f"Produit {j + 1}",
+            "stock": stock,
+            "volume_multiple": volume_multiple,
+            "starting_price": float(rng.randint(5, 20)),
+            "seller_moq": volume_multiple * rng.randint(2, 5),
+            "shelf_life": "01.01.2030",
+            "lot_id": lot_id,
+        })
+    return products
+
+
+def generate_buyers(nb_buyers, products, rng, bid_density=0.5, auto_bid_share=0.8):
+    buyers = []
+    for i in range(nb_buyers):
+        bids = {}
+        for p in products:
+            if rng.random() > bid_density:
+                continue
+            current_price = round(p["starting_price"] * rng.uniform(0.9, 1.3), 2)
+            max_units = max(p["seller_moq"], int(p["stock"] * 0.6)) // p["volume_multiple"]
+            min_units = p["seller_moq"] // p["volume_multiple"]
+            bids[p["id"]] = {
+                "qty_desired": p["volume_multiple"] * rng.randint(min_units, max_units),
+                "current_price": current_price,
+                "max_price": round(current_price * rng.uniform(1.0, 1.6), 2),
+                "moq": p["seller_moq"],
+            }
+        if not bids:
+            p = rng.choice(products)
+            bids[p["id"]] = {
+                "qty_desired": p["seller_moq"] * 2,
+                "current_price": p["starting_price"],
+                "max_price": round(p["starting_price"] * 1.2, 2),
+                "moq": p["seller_moq"],
+            }
+        buyers.append({
+            "name": f"buyer_{i + 1}",
+            "auto_bid": rng.random() < auto_bid_share,
+            "products": bids,
+        })
+    return buyers
+
+
+def generate_market(nb_buyers, nb_products, seed=0, bid_density=0.5):
+    """Renvoie (buyers, products) au format attendu par core/, de 5x3 à 500x50 et au-delà"""
+    rng = random.Random(seed)
+    products = generate_products(nb_products, rng)
+    buyers = generate_buyers(nb_buyers, products, rng, bid_density)
+    return buyers, products
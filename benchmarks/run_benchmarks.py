@@ -0,0 +1,118 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark des points d'entrée du cœur d'allocation sur marchés synthétiques.
+
+    python -m benchmarks.run_benchmarks --sizes 5x3,20x5,500x50 --output bench_results.json
+
+Pour chaque taille (acheteurs x produits) et chaque point d'entrée
+(solve_model, auto_bid, recommendation) : nombre de résolutions MILP,
+temps total, taille du modèle et pic mémoire Python (seconde passe sous
+tracemalloc, hors processus CBC). Les résultats sont écrits en JSON pour
+comparer deux runs.
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import pulp
+
+from benchmarks.market_generator import generate_market
+from core.allocation_algo import build_model, model_stats, run_auto_bid_aggressive, solve_model
+from core.instrumentation import Profiler
+from core.recommendation import simulate_optimal_bid
+from core.solve_cache import SOLVE_CACHE
+
+ENTRY_POINTS = ("solve_model", "auto_bid", "recommendation")
+
+
+def _entry_call(entry, buyers, products, max_rounds):
+    if entry == "solve_model":
+        return lambda: solve_model(buyers, products)
+    if entry == "auto_bid":
+        return lambda: run_auto_bid_aggressive(buyers, products, max_rounds=max_rounds)
+    if entry == "recommendation":
+        user_qtys = {p["id"]: p["seller_moq"] * 2 for p in products[:3]}
+        user_prices = {p["id"]: p["starting_price"] for p in products[:3]}
+        return lambda: simulate_optimal_bid(buyers, products, user_qtys, user_prices, max_rounds=max_rounds)
+    raise ValueError(f"Point d'entrée inconnu : {entry}")
+
+
+def run_case(nb_buyers, nb_products, entry, seed=0, max_rounds=30, memory=True):
+    buyers, products = generate_market(nb_buyers, nb_products, seed=seed)
+    model, _ = build_model(buyers, products)
+    call = _entry_call(entry, buyers, products, max_rounds)
+
+    # Passe chronométrée, sans tracemalloc qui ralentit fortement PuLP
+    SOLVE_CACHE.clear()
+    start = time.perf_counter()
+    with Profiler() as profiler:
+        call()
+    wall_time = time.perf_counter() - start
+    summary = profiler.summary()
+    cache_stats = SOLVE_CACHE.stats()
+
+    peak = None
+    if memory:
+        SOLVE_CACHE.clear()
+        tracemalloc.start()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "size": f"{nb_buyers}x{nb_products}",
+        "entry": entry,
+        "seed": seed,
+        "milp_solves": summary["solves_by_path"].get("milp", 0),
+        "solves": summary,
+        "cache": cache_stats,
+        "wall_time_s": round(wall_time, 4),
+        "peak_memory_kb": round(peak / 1024, 1) if peak is not None else None,
+        "model": model_stats(model),
+    }
+
+
+def parse_sizes(text):
+    sizes = []
+    for item in text.split(","):
+        nb_buyers, nb_products = item.lower().split("x")
+        sizes.append((int(nb_buyers), int(nb_products)))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5x3,20x5")
+    parser.add_argument("--entries", default=",".join(ENTRY_POINTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rounds", type=int, default=30)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--skip-memory", action="store_true", help="pas de seconde passe tracemalloc")
+    args = parser.parse_args()
+
+    results = []
+    for nb_buyers, nb_products in parse_sizes(args.sizes):
+        for entry in args.entries.split(","):
+            result = run_case(nb_buyers, nb_products, entry, args.seed, args.max_rounds, not args.skip_memory)
+            results.append(result)
+            memory = f"{result['peak_memory_kb']:>10.1f} Ko" if result["peak_memory_kb"] is not None else ""
+            print(
+                f"{result['size']:>8} {entry:<15} {result['milp_solves']:>6} résolutions "
+                f"{result['wall_time_s']:>9.3f} s {memory}"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "date": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "pulp": pulp.__version__,
+            "results": results,
+        }, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/solver_overhead.py
+"""
+Micro-benchmark du coût fixe par résolution selon le backend.
+
+    python -m benchmarks.solver_overhead
+
+Un marché minimal (1 acheteur, 1 produit) mesure le surcoût pur de l'appel
+(processus CBC + fichiers vs HiGHS en mémoire), un marché plus gros
+montre ce qu'il en reste quand la résolution elle-même domine.
+"""
+import time
+from core.allocation_algo import solve_model
+from core.solvers import get_solver
+
+REPEAT = 30
+
+
+def tiny_market():
+    products = [{"id": "P1", "stock": 100, "volume_multiple": 10, "seller_moq": 20}]
+    buyers = [{
+        "name": "B1",
+        "auto_bid": True,
+        "products": {"P1": {"qty_desired": 100, "current_price": 5.0, "max_price": 8.0, "moq": 20}},
+    }]
+    return buyers, products
+
+
+def lot_market(nb_buyers=20, nb_products=5):
+    products = [
+        {"id": f"P{j}", "stock": 200 + 50 * j, "volume_multiple": 10, "seller_moq": 20}
+        for j in range(nb_products)
+    ]
+    buyers = []
+    for i in range(nb_buyers):
+        buyers.append({
+            "name": f"B{i}",
+            "auto_bid": True,
+            "products": {
+                p["id"]: {
+                    "qty_desired": 40 + 10 * ((i + j) % 7),
+                    "current_price": 5.0 + ((i * 7 + j * 3) % 11) / 2,
+                    "max_price": 12.0,
+                    "moq": 20,
+                }
+                for j, p in enumerate(products)
+                if (i + j) % 3
+            },
+        })
+    return buyers, products
+
+
+def time_per_solve(buyers, products, backend):
+    # Ni chemin rapide ni presolve : chaque appel passe par le solveur
+    options = {"solver": backend, "fast_path": False, "presolve": False}
+    solve_model(buyers, products, **options)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        solve_model(buyers, products, **options)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    backends = ["cbc"]
+    if get_solver("highs").name != "PULP_CBC_CMD":
+        backends.append("highs")
+
+    print(f"{'marché':<12}{'backend':<10}{'ms / résolution':>18}")
+    for label, (buyers, products) in [("1x1", tiny_market()), ("20x5", lot_market())]:
+        for backend in backends:
+            ms = time_per_solve(buyers, products, backend) * 1000
+            print(f"{label:<12}{backend:<10}{ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
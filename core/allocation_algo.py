@@ -1,6 +1,18 @@
 # core/allocation_algo.py
+import os
+import time
+import numpy as np
 import pulp
-import copy
+from core import instrumentation
+from core.budget import out_of_time
+from core.market_overlay import MarketOverlay
+from core.market_state import MarketState, bid_order
+from core.presolve import PRESOLVE_ENABLED, Presolve
+from core.solvers import get_solver, solve_with_log
+
+# Mode de découverte du prix de l'auto-bid : "step" (paliers), "bisect" ou "oracle"
+DEFAULT_DISCOVERY = os.environ.get("AUTO_BID_DISCOVERY", "step")
+DISCOVERY_MODES = ("step", "bisect", "oracle")
 
 # -----------------------------
 # Fonctions principales
@@ -10,11 +22,21 @@ def round_to_multiple(value, multiple):
         return int(value)
     return int(round(value / multiple) * multiple)
 
-def solve_model(buyers, products, seller_global_moq=80):
-    """Résout le modèle multi-produits avec MOQ Global"""
-    if not buyers:
-        return {}, 0.0
-
+def bid_max_units(prod_conf, product):
+    """
+    Nombre maximal de multiples de volume pour une enchère (borné par le stock
+    et la quantité désirée), 0 si la MOQ produit est inatteignable.
+    """
+    volume_multiple = product["volume_multiple"]
+    if volume_multiple <= 0:
+        return 0
+    max_units = int(min(product["stock"], prod_conf["qty_desired"]) // volume_multiple)
+    if max_units * volume_multiple < prod_conf["moq"]:
+        return 0
+    return max_units
+
+def _build_dense_model(buyers, products, seller_global_moq):
+    """Formulation historique : x, y, n pour chaque couple (acheteur, produit du lot)"""
     model = pulp.LpProblem("Sequential_Auction", pulp.LpMaximize)
 
     x = {}
@@ -65,103 +87,368 @@ def solve_model(buyers, products, seller_global_moq=80):
             model += x[(buyer_name, prod_id)] <= prod_conf["qty_desired"] * y[(buyer_name, prod_id)]
             model += y[(buyer_name, prod_id)] <= z[buyer_name]
 
+    return model, x
+
+def _build_sparse_model(buyers, products, seller_global_moq, state=None, presolved=None):
+    """
+    Formulation creuse : variables uniquement pour les enchères réelles,
+    x = volume_multiple * n substitué, big-M = quantité max atteignable
+    et lignes redondantes supprimées.
+    Bornes, coefficients et demande par produit viennent des tableaux de
+    MarketState ; seules les variables PuLP sont créées élément par élément.
+    presolved : Presolve (core/presolve.py) du même state, seules les
+    enchères qu'il laisse au solveur ont des variables.
+    """
+    state = state or MarketState.from_dicts(buyers, products)
+    model = pulp.LpProblem("Sequential_Auction", pulp.LpMaximize)
+
+    if presolved is None:
+        units = state.max_units()
+        fixed = np.zeros(units.shape, dtype=np.int64)
+        active = single = [False] * len(state.buyers)
+    else:
+        units, fixed = presolved.units, presolved.fixed
+        active, single = presolved.active.tolist(), presolved.single.tolist()
+    coefficients = (state.price * state.volume_multiple).tolist()
+    stock_demand = ((units + fixed) * state.volume_multiple).sum(axis=0)
+    stock_left = (state.stock - (fixed * state.volume_multiple).sum(axis=0)).tolist()
+    units = units.tolist()
+    fixed = fixed.tolist()
+    volume_multiples = state.volume_multiple.tolist()
+    moqs = state.moq.tolist()
+
+    x = {}
+    revenue_terms = []
+    stock_terms = {}
+
+    for buyer in state.buyers:
+        buyer_name = buyer.name
+        # MOQ globale acquise (active) ou reportée sur l'unique enchère (single) : pas de z
+        z = None
+        if not active[buyer.index] and not single[buyer.index]:
+            z = pulp.LpVariable(f"z_{buyer_name}", lowBound=0, upBound=1, cat="Binary")
+        total_alloc_terms = []
+
+        for j in buyer.product_order:
+            prod_id = state.products[j].id
+            volume_multiple = volume_multiples[j]
+            if fixed[buyer.index][j]:
+                x[(buyer_name, prod_id)] = pulp.LpAffineExpression(constant=fixed[buyer.index][j] * volume_multiple)
+                continue
+
+            max_units = units[buyer.index][j]
+            if max_units == 0:
+                continue
+
+            n = pulp.LpVariable(f"n_{buyer_name}_{prod_id}", lowBound=0, upBound=max_units, cat="Integer")
+            y = pulp.LpVariable(f"y_{buyer_name}_{prod_id}", lowBound=0, upBound=1, cat="Binary")
+            x[(buyer_name, prod_id)] = volume_multiple * n
+
+            revenue_terms.append((n, coefficients[buyer.index][j]))
+            stock_terms.setdefault(j, []).append((n, volume_multiple))
+            total_alloc_terms.append((n, volume_multiple))
+
+            # x <= qty_desired * y et x <= big_m * z fusionnées (y <= z)
+            model += volume_multiple * n <= max_units * volume_multiple * y
+            moq = moqs[buyer.index][j]
+            if single[buyer.index]:
+                moq = max(moq, seller_global_moq)
+            if moq > 0:
+                model += volume_multiple * n >= moq * y
+            if z is not None:
+                model += y <= z
+
+        if z is not None and total_alloc_terms and seller_global_moq > 0:
+            model += pulp.LpAffineExpression(total_alloc_terms) >= seller_global_moq * z
+
+    model += pulp.LpAffineExpression(revenue_terms)
+
+    for j, terms in stock_terms.items():
+        # Ligne inutile si toute la demande atteignable tient dans le stock
+        if stock_demand[j] > state.stock[j]:
+            model += pulp.LpAffineExpression(terms) <= stock_left[j]
+
+    return model, x
+
+def build_model(buyers, products, seller_global_moq=80, sparse=True, state=None, presolved=None):
+    """
+    Construit le MILP du lot, renvoie (model, x) avec x[(acheteur, produit)] la quantité allouée.
+    state : MarketState déjà construit pour ces acheteurs et produits (formulation creuse).
+    presolved : Presolve de state (core/presolve.py), enchères fixées hors du modèle.
+    """
+    if sparse:
+        return _build_sparse_model(buyers, products, seller_global_moq, state, presolved)
+    return _build_dense_model(buyers, products, seller_global_moq)
+
+def model_stats(model):
+    """Taille d'un modèle construit : variables, entières (binaires comprises), contraintes, non-zéros"""
+    variables = model.variables()
+    return {
+        "variables": len(variables),
+        "integer_variables": sum(1 for v in variables if v.cat == pulp.LpInteger),
+        "constraints": len(model.constraints),
+        "nonzeros": sum(len(c) for c in model.constraints.values()),
+    }
+
+def extract_allocations(buyers, products, x, seller_global_moq=80, state=None):
+    """Arrondit les quantités aux multiples et annule les acheteurs sous la MOQ globale"""
+    state = state or MarketState.from_dicts(buyers, products)
+    quantities = np.zeros(state.price.shape)
+    for (buyer_name, prod_id), expr in x.items():
+        quantities[state.buyer_index[buyer_name], state.product_index[prod_id]] = expr.value() or 0
+
+    rounded, total_ca = state.round_allocations(quantities, seller_global_moq)
+    return state.allocations_dict(rounded), total_ca
+
+def solve_milp(model, solver=None, warm_start=None, budget=None):
+    """
+    Résout model avec le backend solver, démarrage à chaud et budget
+    facultatifs ; renvoie l'issue du démarrage à chaud (voir core/warm_start.py).
+    """
+    backend = get_solver(solver, **(budget.solver_options() if budget is not None else {}))
+    warm = None
+    log = ""
+    if warm_start is not None:
+        warm = warm_start.solve(model, backend)
+        log = warm_start.last_log
+    elif budget is not None:
+        log = solve_with_log(model, backend)
+    else:
+        model.solve(backend)
+    if budget is not None and budget.record(model, log) == "no_solution":
+        # Aucune solution dans le temps imparti : un dernier essai borné par
+        # un court délai de grâce, le budget reste épuisé ; s'il échoue aussi,
+        # le résultat (vide) est signalé "no_solution" dans le rapport
+        budget.record(model, solve_with_log(model, get_solver(solver, **budget.retry_options())), retry=True)
+    return warm
+
+def solve_model(buyers, products, seller_global_moq=80, solver=None, sparse=True, fast_path=True, warm_start=None,
+                budget=None, presolve=None):
+    """
+    Résout le modèle multi-produits avec MOQ Global (solver : backend, voir core/solvers.py).
+    sparse=False reconstruit la formulation dense historique.
+    fast_path : les marchés découplables sont résolus sans MILP (core/fast_path.py).
+    warm_start : WarmStart (core/warm_start.py) partagé par une suite de résolutions.
+    budget : SolveBudget (core/budget.py) qui borne durée et écart de la résolution.
+    presolve : enchères décidées avant le MILP (core/presolve.py), défaut ALLOCATION_PRESOLVE.
+    """
+    if budget is not None:
+        budget.last_status = None
+    if not buyers:
+        return {}, 0.0
+
+    start = time.perf_counter()
+    if fast_path:
+        from core.fast_path import fast_solve
+
+        result = fast_solve(buyers, products, seller_global_moq)
+        if result is not None:
+            instrumentation.record_solve("solve_model", "fast", solve_s=time.perf_counter() - start)
+            return result
+
+    state = MarketState.from_dicts(buyers, products)
+    presolved = None
+    if sparse and (PRESOLVE_ENABLED if presolve is None else presolve):
+        presolved = Presolve(state, seller_global_moq)
+    model, x = build_model(buyers, products, seller_global_moq, sparse, state, presolved)
+    built = time.perf_counter()
+
     # Résolution
-    model.solve(pulp.PULP_CBC_CMD(msg=False))
+    warm = None
+    if model.variables():
+        warm = solve_milp(model, solver, warm_start, budget)
+    solved = time.perf_counter()
+
+    result = extract_allocations(buyers, products, x, seller_global_moq, state)
+
+    stats = {}
+    if instrumentation.detailed():
+        stats = model_stats(model)
+        stats["status"] = pulp.LpStatus[model.status]
+        stats["extract_s"] = time.perf_counter() - solved
+        if presolved is not None:
+            instrumentation.emit("presolve", source="solve_model", **presolved.summary())
+    if warm:
+        stats["warm_start"] = warm
+    if budget is not None and budget.last_status:
+        stats["budget_status"] = budget.last_status
+    instrumentation.record_solve(
+        "solve_model", "milp", build_s=built - start, solve_s=solved - built, **stats
+    )
+    return result
 
-    allocations = {}
-    total_ca = 0.0
+# -----------------------------
+# Découverte du prix par dichotomie
+# -----------------------------
+def bisect_price(model, buyer_name, prod_id, low_price, high_price, target_alloc, tick=0.01, min_raise=0.0):
+    """
+    Cherche le plus petit prix (à tick près) qui donne target_alloc à
+    l'acheteur, sachant que low_price ne suffit pas et que high_price suffit.
+    La surenchère part de min_raise (le premier palier du mode "step") et
+    double tant qu'elle ne suffit pas, puis l'intervalle trouvé est coupé en
+    deux jusqu'au tick : O(log((high - low) / tick)) résolutions.
+    Le prix trouvé est laissé dans le modèle.
+    """
+    floor_price = min(low_price + max(min_raise, tick), high_price)
+
+    # Galop : surenchère doublée tant qu'elle ne suffit pas
+    raise_by = floor_price - low_price
+    while low_price + raise_by < high_price and not out_of_time(model.budget):
+        test_price = round(low_price + raise_by, 6)
+        model.update_price(buyer_name, prod_id, test_price)
+        allocations, _ = model.solve()
+        if allocations[buyer_name][prod_id] >= target_alloc:
+            high_price = test_price
+            break
+        low_price = test_price
+        raise_by *= 2
 
-    for buyer in buyers:
-        allocations[buyer["name"]] = {}
-        buyer_total = 0
+    # Dichotomie sur le dernier intervalle, jamais sous la surenchère minimale
+    while high_price > floor_price and high_price - low_price > tick and not out_of_time(model.budget):
+        mid = round(round((low_price + high_price) / 2 / tick) * tick, 6)
+        if mid <= low_price or mid >= high_price:
+            break
 
-        for prod_id in buyer["products"]:
-            alloc_value = x[(buyer["name"], prod_id)].value() or 0
-            volume_multiple = next(p["volume_multiple"] for p in products if p["id"] == prod_id)
-            alloc_value = round_to_multiple(alloc_value, volume_multiple)
-            buyer_total += alloc_value
-
-        if buyer_total < seller_global_moq:
-            for prod_id in buyer["products"]:
-                allocations[buyer["name"]][prod_id] = 0
+        model.update_price(buyer_name, prod_id, mid)
+        allocations, _ = model.solve()
+        if allocations[buyer_name][prod_id] >= target_alloc:
+            high_price = mid
         else:
-            for prod_id in buyer["products"]:
-                alloc_value = x[(buyer["name"], prod_id)].value() or 0
-                volume_multiple = next(p["volume_multiple"] for p in products if p["id"] == prod_id)
-                alloc_value = round_to_multiple(alloc_value, volume_multiple)
-                allocations[buyer["name"]][prod_id] = alloc_value
-                total_ca += alloc_value * buyer["products"][prod_id]["current_price"]
+            low_price = mid
 
-    return allocations, total_ca
+    model.update_price(buyer_name, prod_id, high_price)
+    return high_price
 
 # -----------------------------
 # Auto-bid agressif
 # -----------------------------
-def run_auto_bid_aggressive(buyers, products, max_rounds=30):
+def auto_bid_step(model, buyer_name, prod_id, mode="step", tick=0.01):
     """
-    Applique l'auto-bid sur tous les acheteurs.
-    Incrémente les prix progressivement jusqu'à atteindre la quantité désirée.
+    Une passe de l'auto-bid sur une enchère : si l'acheteur n'obtient pas sa
+    quantité, monte son prix jusqu'à la meilleure quantité atteignable au
+    prix max (voir run_auto_bid_aggressive pour les modes).
+    Renvoie True si le prix a été modifié.
     """
-    current_buyers = copy.deepcopy(buyers)
+    from core.price_oracle import critical_price
+
     min_step = 0.1
     pct_step = 0.05
 
-    for _ in range(max_rounds):
-        changes_made = False
+    prod_conf = model.buyers[buyer_name]["products"][prod_id]
+    current_price = prod_conf["current_price"]
+    max_price = prod_conf["max_price"]
+    qty_desired = prod_conf["qty_desired"]
 
-        buyers_sorted = sorted(
-            current_buyers,
-            key=lambda b: max(p["max_price"] for p in b["products"].values()),
-            reverse=True
-        )
+    allocations, _ = model.solve()
+    current_alloc = allocations[buyer_name][prod_id]
 
-        for buyer in buyers_sorted:
-            if not buyer.get("auto_bid", False):
-                continue
+    if current_alloc >= qty_desired or out_of_time(model.budget):
+        return False
 
-            for prod_id, prod_conf in buyer["products"].items():
-                current_price = prod_conf["current_price"]
-                max_price = prod_conf["max_price"]
-                qty_desired = prod_conf["qty_desired"]
+    # Test prix max
+    model.update_price(buyer_name, prod_id, max_price)
+    max_allocs, _ = model.solve()
+    target_alloc = min(max_allocs[buyer_name][prod_id], qty_desired)
 
-                allocations, _ = solve_model(current_buyers, products)
-                current_alloc = allocations[buyer["name"]][prod_id]
+    if target_alloc <= current_alloc:
+        model.update_price(buyer_name, prod_id, current_price)
+        return False
 
-                if current_alloc >= qty_desired:
-                    continue
+    min_raise = max(min_step, current_price * pct_step)
 
-                # Test prix max
-                prod_conf["current_price"] = max_price
-                max_allocs, _ = solve_model(current_buyers, products)
-                target_alloc = min(max_allocs[buyer["name"]][prod_id], qty_desired)
+    if mode == "bisect":
+        test_price = bisect_price(
+            model, buyer_name, prod_id, current_price, max_price, target_alloc, tick, min_raise=min_raise
+        )
+    elif mode == "oracle":
+        test_price = critical_price(
+            model, buyer_name, prod_id, min(current_price + min_raise, max_price), max_price, target_alloc, tick
+        ) or max_price
+    else:
+        # Incrément progressif
+        test_price = current_price
+        while test_price < max_price:
+            if out_of_time(model.budget):
+                # Plus de temps : on garde le dernier prix essayé, le rapport
+                # du budget signale la recherche interrompue
+                break
+            step = max(min_step, test_price * pct_step)
+            next_price = min(test_price + step, max_price)
+
+            model.update_price(buyer_name, prod_id, next_price)
+            new_allocs, _ = model.solve()
+            test_price = next_price
+
+            if new_allocs[buyer_name][prod_id] >= target_alloc:
+                break
+
+    model.update_price(buyer_name, prod_id, round(test_price, 2))
+    return True
+
+def run_auto_bid_aggressive(buyers, products, max_rounds=30, solver=None, mode=None, tick=0.01, warm_start=None, budget=None,
+                            seller_global_moq=80):
+    """
+    Applique l'auto-bid sur tous les acheteurs.
+    Incrémente les prix progressivement jusqu'à atteindre la quantité désirée.
 
-                if target_alloc <= current_alloc:
-                    prod_conf["current_price"] = current_price
-                    continue
+    mode="step"   : paliers de max(0.10 €, 5 %), une résolution par palier (auditable).
+    mode="bisect" : dichotomie entre le prix courant et le prix max, à tick près.
+    mode="oracle" : seuil d'allocation calculé directement (core/price_oracle.py).
+    warm_start : "off", "on" ou "cutoff" (défaut ALLOCATION_WARM_START), voir core/warm_start.py.
+    budget : SolveBudget (core/budget.py) ; une fois épuisé, l'auto-bid s'arrête
+    après l'enchère en cours et garde les prix atteints.
+    seller_global_moq : MOQ globale du lot, la même que pour l'allocation finale.
+    Les trois modes imposent la même surenchère minimale (le premier palier).
+    Au-delà, le prix "step" est le premier palier au-dessus du seuil
+    d'allocation et dépasse donc le prix "bisect" d'au plus un palier
+    (max(0.10 €, 5 % du prix)), les prix "bisect" et "oracle" dépassant eux
+    le seuil d'au plus un tick. Les tours suivants partent de ces prix, l'écart final
+    entre modes peut donc se cumuler sur plusieurs tours.
+    """
+    from core.allocation_model import AllocationModel
+    from core.solve_cache import SOLVE_CACHE
+    from core.warm_start import make_warm_start
 
-                # Incrément progressif
-                test_price = current_price
-                while test_price < max_price:
-                    step = max(min_step, test_price * pct_step)
-                    next_price = min(test_price + step, max_price)
+    mode = mode or DEFAULT_DISCOVERY
+    if mode not in DISCOVERY_MODES:
+        raise ValueError(f"Mode de découverte du prix inconnu : {mode}")
 
-                    prod_conf["current_price"] = next_price
-                    new_allocs, _ = solve_model(current_buyers, products)
-                    new_alloc = new_allocs[buyer["name"]][prod_id]
+    overlay = MarketOverlay(buyers)
+    current_buyers = overlay.buyers()
 
-                    if new_alloc >= target_alloc:
-                        test_price = next_price
-                        changes_made = True
-                        break
+    with instrumentation.span("auto_bid", engine="sequential", mode=mode):
+        model = AllocationModel(
+            current_buyers, products, seller_global_moq, solver=solver, cache=SOLVE_CACHE,
+            warm_start=make_warm_start(warm_start), budget=budget
+        )
+        # Les prix max ne bougent pas pendant l'auto-bid : ordre calculé une fois
+        buyers_sorted = bid_order(current_buyers, products)
 
-                    test_price = next_price
-                    changes_made = True
+        for round_index in range(max_rounds):
+            with instrumentation.span("auto_bid_round", engine="sequential", round=round_index) as round_span:
+                changes_made = False
 
-                prod_conf["current_price"] = round(test_price, 2)
+                for buyer in buyers_sorted:
+                    if not buyer.get("auto_bid", False):
+                        continue
 
-        if not changes_made:
-            break
+                    for prod_id, prod_conf in buyer["products"].items():
+                        if out_of_time(budget):
+                            break
+                        with instrumentation.span(
+                            "auto_bid_bid", engine="sequential", round=round_index,
+                            buyer=buyer["name"], product=prod_id, price_before=prod_conf["current_price"]
+                        ) as bid_span:
+                            if auto_bid_step(model, buyer["name"], prod_id, mode, tick):
+                                changes_made = True
+                            bid_span.set(price_after=prod_conf["current_price"])
+
+                round_span.set(changes=changes_made)
+
+            if not changes_made or out_of_time(budget):
+                break
+
+        # Résolution finale
+        model.solve()
 
-    # Résolution finale
-    solve_model(current_buyers, products)
-    return current_buyers
+    return overlay.materialize()
@@ -0,0 +1,246 @@
+# core/allocation_model.py
+import time
+import pulp
+from core import instrumentation
+from core.allocation_algo import bid_max_units, extract_allocations, model_stats, solve_milp
+from core.fast_path import fast_solve
+from core.market_state import MarketState
+from core.presolve import PRESOLVE_ENABLED, Presolve
+from core.solve_cache import market_key
+
+# -----------------------------
+# Modèle d'allocation persistant
+# -----------------------------
+class AllocationModel:
+    """
+    Modèle MILP d'un lot construit une seule fois puis mis à jour en place.
+    Même formulation creuse que solve_model : seul le coefficient objectif change
+    quand un prix bouge, et seules les lignes d'un acheteur sont touchées
+    quand il est ajouté ou retiré.
+    Le presolve (core/presolve.py) des acheteurs initiaux ne dépend pas des
+    prix : il vaut pour toutes les résolutions de l'auto-bid. Un acheteur
+    ajouté ensuite change la contention des produits, le modèle est alors
+    reconstruit sans presolve.
+    """
+
+    def __init__(self, buyers, products, seller_global_moq=80, solver=None, cache=None, warm_start=None, budget=None,
+                 presolve=None):
+        self.products = {p["id"]: p for p in products}
+        self.seller_global_moq = seller_global_moq
+        self.solver = solver
+        self.cache = cache
+        # WarmStart (core/warm_start.py) : chaque résolution part de la précédente
+        self.warm_start = warm_start
+        # SolveBudget (core/budget.py) : durée et écart bornés par résolution
+        self.budget = budget
+        self._next_key = 0
+
+        buyers = list(buyers)
+        self.presolved = None
+        if buyers and (PRESOLVE_ENABLED if presolve is None else presolve):
+            self.presolved = Presolve(MarketState.from_dicts(buyers, self.products.values()), seller_global_moq)
+            if instrumentation.detailed():
+                instrumentation.emit("presolve", source="AllocationModel", **self.presolved.summary())
+
+        self._reset(buyers)
+        if self.presolved is not None:
+            # Même marché que les acheteurs ajoutés, prix tenus à jour par update_price
+            self._state = self.presolved.state
+        self._ready = True
+
+    # -----------------------------
+    # Mises à jour
+    # -----------------------------
+    def update_price(self, buyer_name, prod_id, price):
+        """Change le prix courant d'une enchère (coefficient objectif uniquement)"""
+        self.buyers[buyer_name]["products"][prod_id]["current_price"] = price
+        n = self.n_mult.get((buyer_name, prod_id))
+        if n is not None:
+            self.model.objective[n] = price * self.products[prod_id]["volume_multiple"]
+        if self._state is not None:
+            self._state.set_price(buyer_name, prod_id, price)
+
+    def add_buyer(self, buyer):
+        """Ajoute un acheteur et ses lignes au modèle (le dict est partagé, pas copié)"""
+        buyer_name = buyer["name"]
+        if self.presolved is not None and self._ready:
+            buyers = [b for name, b in self.buyers.items() if name != buyer_name]
+            self.presolved = None
+            self._reset(buyers + [buyer])
+            self._ready = True
+            return
+        if buyer_name in self.buyers:
+            self.remove_buyer(buyer_name)
+
+        key = f"b{self._next_key}"
+        self._next_key += 1
+        self.buyers[buyer_name] = buyer
+        self._state = None
+
+        presolved = self.presolved
+        i = presolved.state.buyer_index[buyer_name] if presolved is not None else None
+        # MOQ globale acquise ou reportée sur l'unique enchère restante : pas de z
+        single = i is not None and presolved.single[i]
+        z = None
+        if i is None or not (presolved.active[i] or single):
+            z = pulp.LpVariable(f"z_{key}", lowBound=0, upBound=1, cat="Binary")
+            self.z[buyer_name] = z
+
+        total_alloc_terms = []
+        for prod_id, prod_conf in buyer["products"].items():
+            product = self.products[prod_id]
+            volume_multiple = product["volume_multiple"]
+            stock_row = True
+            if i is None:
+                max_units = bid_max_units(prod_conf, product)
+            else:
+                j = presolved.state.product_index[prod_id]
+                if presolved.fixed[i, j]:
+                    self.x[(buyer_name, prod_id)] = pulp.LpAffineExpression(
+                        constant=int(presolved.fixed[i, j]) * volume_multiple
+                    )
+                    continue
+                max_units = int(presolved.units[i, j])
+                stock_row = not presolved.uncontended[j]
+            if max_units == 0:
+                continue
+
+            n = pulp.LpVariable(f"n_{key}_{prod_id}", lowBound=0, upBound=max_units, cat="Integer")
+            y = pulp.LpVariable(f"y_{key}_{prod_id}", lowBound=0, upBound=1, cat="Binary")
+            self.x[(buyer_name, prod_id)] = volume_multiple * n
+            self.y[(buyer_name, prod_id)] = y
+            self.n_mult[(buyer_name, prod_id)] = n
+
+            self.model.objective[n] = prod_conf["current_price"] * volume_multiple
+            if stock_row:
+                self._stock_row(prod_id).expr[n] = volume_multiple
+            total_alloc_terms.append(volume_multiple * n)
+
+            self.model += volume_multiple * n <= max_units * volume_multiple * y
+            moq = max(prod_conf["moq"], self.seller_global_moq) if single else prod_conf["moq"]
+            if moq > 0:
+                self.model += volume_multiple * n >= moq * y
+            if z is not None:
+                self.model += y <= z
+
+        if z is not None and total_alloc_terms and self.seller_global_moq > 0:
+            self.model += pulp.lpSum(total_alloc_terms) >= self.seller_global_moq * z
+
+    def remove_buyer(self, buyer_name):
+        """
+        Retire un acheteur en fixant z à 0 (ses variables n sans z) : ses
+        lignes restent dans le modèle mais n'allouent plus rien (CBC refuse
+        les colonnes orphelines). Le presolve reste valable, la contention
+        ne peut que baisser.
+        """
+        buyer = self.buyers.pop(buyer_name)
+        self._state = None
+        z = self.z.pop(buyer_name, None)
+        if z is not None:
+            z.upBound = 0
+
+        for prod_id in buyer["products"]:
+            if (buyer_name, prod_id) not in self.n_mult:
+                # Enchère fixée par le presolve (quantité constante) ou sans variable
+                self.x.pop((buyer_name, prod_id), None)
+                continue
+            n = self.n_mult.pop((buyer_name, prod_id))
+            if z is None:
+                n.upBound = 0
+            self.model.objective.pop(n, None)
+            del self.x[(buyer_name, prod_id)]
+            del self.y[(buyer_name, prod_id)]
+
+    # -----------------------------
+    # Résolution
+    # -----------------------------
+    def solve(self, solver=None):
+        """Résout le modèle courant, renvoie (allocations, total_ca) comme solve_model"""
+        if not self.buyers:
+            return {}, 0.0
+
+        if self.cache is None:
+            return self._solve(solver)
+
+        key = market_key(self.buyers.values(), self.products.values(), self.seller_global_moq)
+        result = self.cache.get(key)
+        if result is None and self.budget is not None:
+            result = self.budget.results.get(key)
+        if result is None:
+            result = self._solve(solver)
+            if self.budget is None or self.budget.last_status in (None, "optimal"):
+                self.cache.put(key, result)
+            else:
+                self.budget.results[key] = result
+        else:
+            instrumentation.record_solve("AllocationModel", "cache")
+        return result
+
+    def _solve(self, solver):
+        if self.budget is not None:
+            self.budget.last_status = None
+        start = time.perf_counter()
+        result = fast_solve(self.buyers.values(), self.products.values(), self.seller_global_moq)
+        if result is not None:
+            instrumentation.record_solve("AllocationModel", "fast", solve_s=time.perf_counter() - start)
+            return result
+
+        warm = None
+        if self.n_mult:
+            warm = solve_milp(self.model, solver or self.solver, self.warm_start, self.budget)
+        solved = time.perf_counter()
+        result = extract_allocations(
+            self.buyers.values(), self.products.values(), self.x, self.seller_global_moq, self.state()
+        )
+
+        stats = {}
+        if instrumentation.detailed():
+            stats = model_stats(self.model)
+            stats["status"] = pulp.LpStatus[self.model.status]
+            stats["extract_s"] = time.perf_counter() - solved
+        if warm:
+            stats["warm_start"] = warm
+        if self.budget is not None and self.budget.last_status:
+            stats["budget_status"] = self.budget.last_status
+        instrumentation.record_solve("AllocationModel", "milp", solve_s=solved - start, **stats)
+        return result
+
+    def state(self):
+        """MarketState des acheteurs courants (tenu à jour par update_price)"""
+        if self._state is None:
+            self._state = MarketState.from_dicts(self.buyers.values(), self.products.values())
+        return self._state
+
+    # -----------------------------
+    # Utilitaires internes
+    # -----------------------------
+    def _reset(self, buyers):
+        self._ready = False
+        self.model = pulp.LpProblem("Sequential_Auction", pulp.LpMaximize)
+        self.model += pulp.LpAffineExpression()
+
+        self.buyers = {}
+        self.x = {}
+        self.y = {}
+        self.z = {}
+        self.n_mult = {}
+
+        self._stock_constraints = {}
+        # MarketState des acheteurs courants, reconstruit après ajout ou retrait
+        self._state = None
+
+        for buyer in buyers:
+            self.add_buyer(buyer)
+
+    def _stock_row(self, prod_id):
+        row = self._stock_constraints.get(prod_id)
+        if row is None:
+            row = pulp.LpConstraint(
+                pulp.LpAffineExpression(),
+                sense=pulp.LpConstraintLE,
+                rhs=self.products[prod_id]["stock"],
+                name=f"stock_{prod_id}",
+            )
+            self.model += row
+            self._stock_constraints[prod_id] = row
+        return row
@@ -0,0 +1,167 @@
+# core/budget.py
+import re
+import time
+import pulp
+
+# -----------------------------
+# Budget de latence des appels interactifs
+# -----------------------------
+# Une simulation ou une recommandation lancée depuis l'espace acheteur reçoit
+# un délai total. Chaque résolution MILP en prend une part (timeLimit) ;
+# une fois passée la moitié du délai, elle s'arrête aussi à un écart relatif
+# gapRel de l'optimum. CBC renvoie alors sa meilleure solution connue. Une
+# fois le délai écoulé, les moteurs d'auto-bid s'arrêtent à la fin de
+# l'enchère en cours, au dernier prix essayé.
+# report() dit si le résultat est prouvé optimal, "best_effort" (avec le
+# plus grand écart observé) ou "no_solution" (une résolution n'a rien trouvé,
+# même après le délai de grâce). La clôture ("Placer l'enchère") n'a pas de
+# budget et reste exacte.
+# Seul le journal de CBC prouve l'optimalité : avec un autre backend
+# (HiGHS renvoie "optimal" même arrêté par gapRel), toute résolution
+# budgétée est "best_effort".
+#
+# Les résultats non prouvés optimaux ne sont pas mis dans le cache de
+# résolutions, partagé avec la clôture : le budget les garde (results) pour
+# les seules résolutions de l'appel.
+
+# Écart relatif accepté par défaut pour les appels interactifs
+DEFAULT_GAP_REL = 0.01
+
+# Part du temps restant accordée à une résolution, et plancher (démarrage de CBC).
+# La première résolution, sans solution initiale, en reçoit davantage.
+SOLVE_SHARE = 0.25
+FIRST_SOLVE_SHARE = 0.5
+MIN_SOLVE_S = 0.5
+
+# Part du délai restante sous laquelle l'écart gapRel est appliqué
+GAP_BELOW_SHARE = 0.5
+
+# Délai de grâce du second essai d'une résolution restée sans solution
+NO_SOLUTION_GRACE_S = 2.0
+
+_RESULT = re.compile(r"^Result - (.*)$", re.MULTILINE)
+_OBJECTIVE = re.compile(r"^Objective value:\s+(\S+)", re.MULTILINE)
+_BOUND = re.compile(r"^(?:Upper|Lower) bound:\s+(\S+)", re.MULTILINE)
+
+
+class SolveBudget:
+
+    def __init__(self, deadline_s, gap_rel=DEFAULT_GAP_REL):
+        self.deadline_s = deadline_s
+        self.gap_rel = gap_rel
+        self.start = time.monotonic()
+        self.solves = 0
+        self.proven = 0
+        self.max_gap = 0.0
+        self.no_solution = 0
+        # Résolutions restées sans solution après le délai de grâce
+        self.failed = 0
+        self.truncated = False
+        # Résultats non prouvés optimaux de l'appel, par clé de marché (core/solve_cache.py)
+        self.results = {}
+        # Statut de la dernière résolution : "optimal", "best_effort" ou "no_solution"
+        self.last_status = None
+
+    # -----------------------------
+    # Temps
+    # -----------------------------
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return max(0.0, self.deadline_s - self.elapsed())
+
+    def expired(self):
+        """Vrai si le délai est écoulé (ou si une résolution n'a rien trouvé dans sa part)"""
+        return self.remaining() <= 0 or self.no_solution > 0
+
+    def stop(self):
+        """À appeler par un moteur qui s'arrête avant la fin faute de temps"""
+        self.truncated = True
+
+    def solver_options(self):
+        """timeLimit de la prochaine résolution, et gapRel si le temps devient compté"""
+        remaining = self.remaining()
+        options = {
+            "timeLimit": round(max(MIN_SOLVE_S, remaining * (SOLVE_SHARE if self.solves else FIRST_SOLVE_SHARE)), 3),
+        }
+        if self.gap_rel and remaining < self.deadline_s * GAP_BELOW_SHARE:
+            options["gapRel"] = self.gap_rel
+        return options
+
+    def retry_options(self):
+        """Second essai d'une résolution sans solution : délai de grâce fixe"""
+        return {"timeLimit": NO_SOLUTION_GRACE_S, "gapRel": self.gap_rel}
+
+    # -----------------------------
+    # Résultats
+    # -----------------------------
+    def record(self, model, log="", retry=False):
+        """
+        Classe la résolution de model d'après son statut PuLP et le journal
+        CBC (solve_with_log), renvoie "optimal", "best_effort" ou "no_solution".
+        Sans journal (autre backend que CBC), l'optimalité n'est pas prouvée.
+        retry : second essai (retry_options) d'une résolution sans solution.
+        """
+        self.solves += 1
+        result = _RESULT.search(log)
+        result = result.group(1) if result else ""
+
+        if model.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+            status = "no_solution"
+            self.no_solution += 1
+            if retry:
+                self.failed += 1
+        elif model.sol_status == pulp.LpSolutionOptimal and result == "Optimal solution found":
+            status = "optimal"
+            self.proven += 1
+        else:
+            status = "best_effort"
+            objective = _OBJECTIVE.search(log)
+            bound = _BOUND.search(log)
+            if objective and bound:
+                objective, bound = float(objective.group(1)), float(bound.group(1))
+                self.max_gap = max(self.max_gap, abs(bound - objective) / max(1.0, abs(bound)))
+            else:
+                self.max_gap = max(self.max_gap, self.gap_rel or 0.0)
+
+        self.last_status = status
+        return status
+
+    def report(self):
+        """{"status": "optimal" | "best_effort" | "no_solution", "gap", "solves", "elapsed_s", "deadline_s", "truncated"}"""
+        if self.failed:
+            status = "no_solution"
+        elif self.proven == self.solves and not self.truncated:
+            status = "optimal"
+        else:
+            status = "best_effort"
+        return {
+            "status": status,
+            "gap": round(self.max_gap, 6),
+            "solves": self.solves,
+            "elapsed_s": round(self.elapsed(), 3),
+            "deadline_s": self.deadline_s,
+            "truncated": self.truncated,
+        }
+
+
+def out_of_time(budget):
+    """Vrai si le budget est épuisé (le moteur appelant est alors marqué interrompu)"""
+    if budget is None or not budget.expired():
+        return False
+    budget.stop()
+    return True
+
+
+def combine_reports(reports, deadline_s):
+    """Rapport unique des phases successives d'un appel au délai total deadline_s"""
+    statuses = {r["status"] for r in reports}
+    return {
+        "status": next(s for s in ("no_solution", "best_effort", "optimal") if s in statuses),
+        "gap": max(r["gap"] for r in reports),
+        "solves": sum(r["solves"] for r in reports),
+        "elapsed_s": round(sum(r["elapsed_s"] for r in reports), 3),
+        "deadline_s": deadline_s,
+        "truncated": any(r["truncated"] for r in reports),
+    }
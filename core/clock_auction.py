@@ -0,0 +1,91 @@
+# core/clock_auction.py
+from core import instrumentation
+from core.allocation_model import AllocationModel
+from core.budget import out_of_time
+from core.market_overlay import MarketOverlay
+from core.solve_cache import SOLVE_CACHE
+from core.warm_start import make_warm_start
+
+# -----------------------------
+# Enchère à horloge ascendante simultanée
+# -----------------------------
+def run_clock_auction(buyers, products, max_rounds=200, seller_global_moq=80, solver=None, warm_start=None, budget=None):
+    """
+    Variante simultanée de run_auto_bid_aggressive : à chaque tour, une
+    résolution, puis chaque acheteur auto-bid monte d'un palier (max(0.10 €,
+    5 %), plafonné à son prix max) sur chaque produit disputé où il obtient
+    moins que sa cible. Un produit est disputé quand son stock est épuisé et
+    qu'un autre acheteur en détient une part ; la cible est, comme dans
+    auto_bid_step, la quantité obtenue au prix max (une résolution de plus
+    par enchère disputée). L'horloge s'arrête quand plus aucun prix ne monte.
+    Renvoie la même structure d'acheteurs mis à jour.
+    warm_start : "off", "on" ou "cutoff", voir core/warm_start.py.
+    budget : SolveBudget (core/budget.py), l'horloge s'arrête une fois épuisé.
+    """
+    overlay = MarketOverlay(buyers)
+    current_buyers = overlay.buyers()
+    min_step = 0.1
+    pct_step = 0.05
+
+    with instrumentation.span("auto_bid", engine="clock"):
+        model = AllocationModel(
+            current_buyers, products, seller_global_moq, solver=solver, cache=SOLVE_CACHE,
+            warm_start=make_warm_start(warm_start), budget=budget
+        )
+
+        for round_index in range(max_rounds):
+            with instrumentation.span("auto_bid_round", engine="clock", round=round_index) as round_span:
+                allocations, _ = model.solve()
+                contested = contested_products(allocations, products)
+                raises = []
+
+                for buyer in current_buyers:
+                    if not buyer.get("auto_bid", False):
+                        continue
+
+                    for prod_id, prod_conf in buyer["products"].items():
+                        current_price = prod_conf["current_price"]
+                        max_price = prod_conf["max_price"]
+                        current_alloc = allocations[buyer["name"]][prod_id]
+                        if current_alloc >= prod_conf["qty_desired"] or current_price >= max_price:
+                            continue
+                        # Stock libre ou seul détenteur : monter ne change rien
+                        holders = contested.get(prod_id, ())
+                        if not any(name != buyer["name"] for name in holders):
+                            continue
+                        if target_alloc(model, buyer["name"], prod_id) <= current_alloc:
+                            continue
+
+                        step = max(min_step, current_price * pct_step)
+                        raises.append((buyer["name"], prod_id, min(round(current_price + step, 2), max_price)))
+
+                for buyer_name, prod_id, price in raises:
+                    model.update_price(buyer_name, prod_id, price)
+                round_span.set(changes=len(raises))
+
+            if not raises or out_of_time(budget):
+                break
+
+    return overlay.materialize()
+
+
+def contested_products(allocations, products):
+    """{prod_id: [acheteurs servis]} des produits dont le stock restant ne permet plus un multiple de volume"""
+    contested = {}
+    for product in products:
+        prod_id = product["id"]
+        holders = [name for name, alloc in allocations.items() if alloc.get(prod_id, 0) > 0]
+        allocated = sum(allocations[name][prod_id] for name in holders)
+        if product["stock"] - allocated < product["volume_multiple"]:
+            contested[prod_id] = holders
+    return contested
+
+
+def target_alloc(model, buyer_name, prod_id):
+    """Quantité que l'acheteur obtiendrait au prix max, les autres prix inchangés, plafonnée à qty_desired"""
+    prod_conf = model.buyers[buyer_name]["products"][prod_id]
+    current_price = prod_conf["current_price"]
+    model.update_price(buyer_name, prod_id, prod_conf["max_price"])
+    max_allocs, _ = model.solve()
+    model.update_price(buyer_name, prod_id, current_price)
+    return min(max_allocs[buyer_name][prod_id], prod_conf["qty_desired"])
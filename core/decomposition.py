@@ -0,0 +1,98 @@
+# core/decomposition.py
+from concurrent.futures import ProcessPoolExecutor
+from core.solve_cache import cached_solve_model
+
+# -----------------------------
+# Découpage en sous-marchés indépendants
+# -----------------------------
+def split_components(buyers, products):
+    """
+    Composantes connexes du graphe acheteurs-produits : deux produits sont liés
+    dès qu'un acheteur enchérit sur les deux (sa MOQ globale les couple).
+    Renvoie une liste de (buyers, products) ; les produits sans enchère sont ignorés.
+    """
+    parent = {p["id"]: p["id"] for p in products}
+
+    def find(pid):
+        while parent[pid] != pid:
+            parent[pid] = parent[parent[pid]]
+            pid = parent[pid]
+        return pid
+
+    for buyer in buyers:
+        prod_ids = list(buyer["products"])
+        for pid in prod_ids[1:]:
+            root_a, root_b = find(prod_ids[0]), find(pid)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    components = {}
+    for buyer in buyers:
+        if not buyer["products"]:
+            continue
+        root = find(next(iter(buyer["products"])))
+        components.setdefault(root, ([], []))[0].append(buyer)
+
+    for product in products:
+        root = find(product["id"])
+        if root in components:
+            components[root][1].append(product)
+
+    return list(components.values())
+
+
+def _merge(buyers, results):
+    """Fusionne les (allocations, total_ca) des composantes dans l'ordre des acheteurs"""
+    merged = {}
+    for allocations, _ in results:
+        merged.update(allocations)
+
+    allocations = {b["name"]: merged.get(b["name"], {pid: 0 for pid in b["products"]}) for b in buyers}
+    total_ca = sum(total_ca for _, total_ca in results)
+    return allocations, total_ca
+
+
+def _solve_component(args):
+    buyers, products, seller_global_moq, solver = args
+    return cached_solve_model(buyers, products, seller_global_moq, solver=solver)
+
+
+def _map(func, tasks, parallel, max_workers):
+    if parallel and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(func, tasks))
+    return [func(task) for task in tasks]
+
+
+def solve_decomposed(buyers, products, seller_global_moq=80, solver=None, parallel=False, max_workers=None):
+    """
+    Même résultat que solve_model, une résolution (avec cache) par composante
+    indépendante, éventuellement sur un pool de processus.
+    """
+    if not buyers:
+        return {}, 0.0
+
+    tasks = [
+        (sub_buyers, sub_products, seller_global_moq, solver)
+        for sub_buyers, sub_products in split_components(buyers, products)
+    ]
+    return _merge(buyers, _map(_solve_component, tasks, parallel, max_workers))
+
+
+# -----------------------------
+# Clôture d'un lot par composantes
+# -----------------------------
+def auto_bid_decomposed(buyers, products, seller_global_moq=80, solver=None, **options):
+    """
+    run_auto_bid (core/auto_bid.py) sur chaque composante indépendante : les
+    composantes ne se disputant rien, les prix finaux sont ceux de l'auto-bid
+    du marché entier, mais un tour ne résout plus que sa composante.
+    Renvoie les acheteurs mis à jour, dans l'ordre reçu.
+    """
+    from core.auto_bid import run_auto_bid
+
+    updated = {}
+    for sub_buyers, sub_products in split_components(buyers, products):
+        for buyer in run_auto_bid(sub_buyers, sub_products, solver=solver, seller_global_moq=seller_global_moq, **options):
+            updated[buyer["name"]] = buyer
+    return [updated.get(b["name"], b) for b in buyers]
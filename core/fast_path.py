@@ -0,0 +1,118 @@
+# core/fast_path.py
+import math
+from collections import deque
+
+# -----------------------------
+# Allocation exacte sans MILP pour les marchés simples
+# -----------------------------
+# Le marché se découple produit par produit quand la MOQ globale ne lie pas
+# plusieurs produits : pour chaque acheteur, soit il n'a qu'une enchère
+# atteignable (la MOQ globale devient alors une MOQ produit), soit chacune de
+# ses enchères atteint déjà la MOQ globale dès qu'elle est servie.
+# Chaque produit est alors un sac à dos en unités de volume_multiple où
+# chaque enchère prend 0 ou entre min_units et max_units unités, résolu
+# exactement par programmation dynamique en O(enchères × stock).
+
+MAX_CAPACITY_UNITS = 100_000
+
+
+def _bid_units(prod_conf, product):
+    """(min_units, max_units) d'une enchère, None si elle ne peut rien obtenir"""
+    volume_multiple = product["volume_multiple"]
+    if volume_multiple <= 0:
+        return None
+    max_units = int(min(product["stock"], prod_conf["qty_desired"]) // volume_multiple)
+    min_units = max(1, math.ceil(prod_conf["moq"] / volume_multiple))
+    if max_units < min_units:
+        return None
+    return min_units, max_units
+
+
+def _knapsack(bids, capacity):
+    """
+    bids : liste de (clé, valeur_par_unité, min_units, max_units).
+    Renvoie {clé: unités} maximisant la valeur sous la capacité.
+    best[c] est le meilleur revenu avec au plus c unités (croissant en c).
+    """
+    best = [0.0] * (capacity + 1)
+    choices = []
+
+    for _, value, min_units, max_units in bids:
+        new_best = best[:]
+        choice = [0] * (capacity + 1)
+        window = deque()
+
+        # new_best[c] = max(best[c], max_{k in [min, max]} best[c - k] + value * k)
+        for c in range(min_units, capacity + 1):
+            j = c - min_units
+            score = best[j] - value * j
+            while window and best[window[-1]] - value * window[-1] <= score:
+                window.pop()
+            window.append(j)
+            while window[0] < c - max_units:
+                window.popleft()
+
+            start = window[0]
+            candidate = best[start] + value * (c - start)
+            if candidate > new_best[c] + 1e-9:
+                new_best[c] = candidate
+                choice[c] = c - start
+
+        best = new_best
+        choices.append(choice)
+
+    units = {}
+    c = capacity
+    for (key, _, _, _), choice in zip(reversed(bids), reversed(choices)):
+        units[key] = choice[c]
+        c -= choice[c]
+    return units
+
+
+def fast_solve(buyers, products, seller_global_moq=80):
+    """
+    Résout exactement les marchés découplables, renvoie (allocations, total_ca)
+    au format de solve_model, ou None si la forme du marché n'est pas prise en charge.
+    """
+    products_by_id = {p["id"]: p for p in products}
+    bids_by_product = {}
+
+    for buyer in buyers:
+        feasible = {}
+        for prod_id, prod_conf in buyer["products"].items():
+            units = _bid_units(prod_conf, products_by_id[prod_id])
+            if units is not None:
+                feasible[prod_id] = units
+
+        for prod_id, (min_units, max_units) in feasible.items():
+            volume_multiple = products_by_id[prod_id]["volume_multiple"]
+            global_units = math.ceil(seller_global_moq / volume_multiple)
+            if len(feasible) == 1:
+                min_units = max(min_units, global_units)
+                if min_units > max_units:
+                    continue
+            elif min_units < global_units:
+                return None
+
+            price = buyer["products"][prod_id]["current_price"]
+            bids_by_product.setdefault(prod_id, []).append(
+                (buyer["name"], price * volume_multiple, min_units, max_units)
+            )
+
+    allocations = {b["name"]: {pid: 0 for pid in b["products"]} for b in buyers}
+    total_ca = 0.0
+
+    for prod_id, bids in bids_by_product.items():
+        product = products_by_id[prod_id]
+        capacity = int(product["stock"] // product["volume_multiple"])
+        if capacity > MAX_CAPACITY_UNITS:
+            return None
+
+        for buyer_name, units in _knapsack(bids, capacity).items():
+            allocations[buyer_name][prod_id] = units * product["volume_multiple"]
+
+    for buyer in buyers:
+        for prod_id, alloc_value in allocations[buyer["name"]].items():
+            total_ca += alloc_value * buyer["products"][prod_id]["current_price"]
+
+    return allocations, total_ca
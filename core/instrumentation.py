@@ -0,0 +1,209 @@
+# core/instrumentation.py
+import json
+import os
+import threading
+import time
+
+# -----------------------------
+# Instrumentation des résolutions et de l'auto-bid
+# -----------------------------
+# Les événements sont des dicts envoyés aux "sinks" enregistrés (listes en
+# mémoire, fichiers JSON lines). Sans sink, emit() et span() s'arrêtent au
+# premier test : le coût en production se limite à un compteur entier.
+# Le détail des résolutions (taille du modèle, statut, presolve) n'est
+# calculé que si un sink le demande (add_sink(..., detailed=True), défaut) ;
+# la progression des tâches de fond (services/jobs.py) s'en passe.
+#
+# Événements émis :
+#   solve            : source, path (fast | milp | cache), build_s, solve_s,
+#                      extract_s, status, variables, constraints, nonzeros,
+#                      warm_start (accepted | rejected, voir core/warm_start.py)
+#   auto_bid         : engine, mode, duration_s, solves
+#   auto_bid_round   : engine, round, duration_s, solves, changes
+#   auto_bid_bid     : engine, round, buyer, product, duration_s, solves,
+#                      price_before, price_after
+#   recommendation   : products, duration_s, solves
+#   presolve         : source, unreachable_bids, buyers_below_global_moq,
+#                      uncontended_products, fixed_bids, residual_bids,
+#                      residual_buyers (voir core/presolve.py)
+
+_sinks = []
+# Sinks qui veulent le détail des résolutions (taille du modèle, statut, presolve)
+_detailed_sinks = []
+_lock = threading.Lock()
+_solve_count = 0
+_warm_starts = {"accepted": 0, "rejected": 0}
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def detailed():
+    """Vrai si un sink veut le détail des résolutions, coûteux à calculer (model_stats)"""
+    return bool(_detailed_sinks)
+
+
+def add_sink(sink, detailed=True):
+    """detailed=False : le sink ne lit que les événements (progression), sans le détail des résolutions"""
+    _sinks.append(sink)
+    if detailed:
+        _detailed_sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+    if sink in _detailed_sinks:
+        _detailed_sinks.remove(sink)
+
+
+def emit(event, **fields):
+    if not _sinks:
+        return
+    record = {"event": event, "ts": time.time(), **fields}
+    for sink in list(_sinks):
+        sink(record)
+
+
+def solve_count():
+    """Nombre de résolutions demandées depuis le démarrage du processus"""
+    return _solve_count
+
+
+def warm_start_counts():
+    """{"accepted", "rejected"} : solutions initiales utilisées ou non par CBC depuis le démarrage"""
+    return dict(_warm_starts)
+
+
+def record_solve(source, path, **fields):
+    """À appeler à chaque résolution (y compris chemin rapide et cache)"""
+    global _solve_count
+    _solve_count += 1
+    if fields.get("warm_start"):
+        _warm_starts[fields["warm_start"]] += 1
+    if _sinks:
+        emit("solve", source=source, path=path, **fields)
+
+
+# -----------------------------
+# Spans : durée et nombre de résolutions d'un bloc
+# -----------------------------
+class _Span:
+    __slots__ = ("event", "fields", "start", "solves")
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.solves = _solve_count
+        return self
+
+    def __exit__(self, *exc):
+        emit(
+            self.event,
+            duration_s=round(time.perf_counter() - self.start, 6),
+            solves=_solve_count - self.solves,
+            **self.fields,
+        )
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(event, **fields):
+    """Context manager qui émet event avec sa durée et ses résolutions (no-op si désactivé)"""
+    if not _sinks:
+        return _NULL_SPAN
+    return _Span(event, fields)
+
+
+# -----------------------------
+# Collecte
+# -----------------------------
+class JsonLinesSink:
+    """Ajoute chaque événement en une ligne JSON à la fin d'un fichier"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+
+    def __call__(self, record):
+        with _lock:
+            self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class Profiler:
+    """
+    Active l'instrumentation le temps d'un bloc :
+
+        with Profiler("trace.jsonl") as profiler:
+            run_auto_bid_aggressive(buyers, products)
+        print(profiler.summary())
+    """
+
+    def __init__(self, path=None):
+        self.events = []
+        self._file_sink = JsonLinesSink(path) if path else None
+
+    def __call__(self, record):
+        self.events.append(record)
+        if self._file_sink is not None:
+            self._file_sink(record)
+
+    def __enter__(self):
+        add_sink(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_sink(self)
+        if self._file_sink is not None:
+            self._file_sink.close()
+        return False
+
+    def summary(self):
+        solves = [e for e in self.events if e["event"] == "solve"]
+        by_path = {}
+        warm_starts = {"accepted": 0, "rejected": 0}
+        for e in solves:
+            by_path[e["path"]] = by_path.get(e["path"], 0) + 1
+            if e.get("warm_start"):
+                warm_starts[e["warm_start"]] += 1
+        return {
+            "solves": len(solves),
+            "solves_by_path": by_path,
+            "build_s": round(sum(e.get("build_s", 0) for e in solves), 6),
+            "solve_s": round(sum(e.get("solve_s", 0) for e in solves), 6),
+            "auto_bid_rounds": sum(1 for e in self.events if e["event"] == "auto_bid_round"),
+            "warm_starts": warm_starts,
+            "presolve": {
+                key: sum(e[key] for e in self.events if e["event"] == "presolve")
+                for key in ("unreachable_bids", "buyers_below_global_moq", "fixed_bids", "residual_bids")
+            },
+        }
+
+
+# ALLOCATION_TRACE=chemin.jsonl active la trace pour tout le processus
+if os.environ.get("ALLOCATION_TRACE"):
+    add_sink(JsonLinesSink(os.environ["ALLOCATION_TRACE"]))
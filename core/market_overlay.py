@@ -0,0 +1,128 @@
+# core/market_overlay.py
+from collections.abc import Mapping
+
+# -----------------------------
+# Marché en copie-sur-écriture
+# -----------------------------
+# Les simulations et l'auto-bid essaient des prix sans toucher au marché
+# d'origine. Plutôt que copy.deepcopy de tous les acheteurs, MarketOverlay
+# garde le marché de base (jamais modifié) et un petit dict des champs
+# modifiés par (acheteur, produit). Les vues renvoyées par buyers() se lisent
+# comme les dicts de core/ et leurs écritures vont dans le calque : chaque
+# essai coûte O(modifications), pas O(marché).
+
+
+class MarketOverlay:
+
+    def __init__(self, buyers):
+        self.base = list(buyers)
+        # {(acheteur, produit): {champ: valeur}}
+        self.overrides = {}
+        # Acheteurs ajoutés par le calque (acheteur simulé), possédés par lui
+        self.extra = []
+
+    def add_buyer(self, buyer):
+        """
+        Ajoute un acheteur propre au calque (acheteur simulé) : le dict est
+        repris tel quel et modifié directement, le marché de base n'est pas touché.
+        """
+        self.extra.append(buyer)
+        return buyer
+
+    def fork(self):
+        """Calque enfant sur la même base : les essais de l'enfant ne touchent pas celui-ci"""
+        child = MarketOverlay(self.base)
+        child.overrides = {key: dict(fields) for key, fields in self.overrides.items()}
+        child.extra = [
+            {**buyer, "products": {pid: dict(conf) for pid, conf in buyer["products"].items()}}
+            for buyer in self.extra
+        ]
+        return child
+
+    def buyers(self):
+        """Acheteurs vus à travers le calque (base puis acheteurs ajoutés)"""
+        return [BuyerView(self, buyer) for buyer in self.base] + self.extra
+
+    def materialize(self):
+        """Acheteurs au format dict, modifications appliquées, indépendants de la base"""
+        buyers = []
+        for buyer in self.base:
+            buyers.append({
+                **buyer,
+                "products": {
+                    pid: {**conf, **self.overrides.get((buyer["name"], pid), {})}
+                    for pid, conf in buyer["products"].items()
+                },
+            })
+        return buyers + [
+            {**buyer, "products": {pid: dict(conf) for pid, conf in buyer["products"].items()}}
+            for buyer in self.extra
+        ]
+
+
+# -----------------------------
+# Vues
+# -----------------------------
+class BuyerView(Mapping):
+    __slots__ = ("_overlay", "_buyer")
+
+    def __init__(self, overlay, buyer):
+        self._overlay = overlay
+        self._buyer = buyer
+
+    def __getitem__(self, key):
+        if key == "products":
+            return ProductsView(self._overlay, self._buyer["name"], self._buyer["products"])
+        return self._buyer[key]
+
+    def __iter__(self):
+        return iter(self._buyer)
+
+    def __len__(self):
+        return len(self._buyer)
+
+
+class ProductsView(Mapping):
+    __slots__ = ("_overlay", "_name", "_products")
+
+    def __init__(self, overlay, name, products):
+        self._overlay = overlay
+        self._name = name
+        self._products = products
+
+    def __getitem__(self, prod_id):
+        return BidView(self._overlay, (self._name, prod_id), self._products[prod_id])
+
+    def __iter__(self):
+        return iter(self._products)
+
+    def __len__(self):
+        return len(self._products)
+
+
+class BidView(Mapping):
+    """Enchère lue à travers le calque ; bid[champ] = valeur n'écrit que dans le calque"""
+    __slots__ = ("_overlay", "_key", "_conf")
+
+    def __init__(self, overlay, key, conf):
+        self._overlay = overlay
+        self._key = key
+        self._conf = conf
+
+    def __getitem__(self, field):
+        fields = self._overlay.overrides.get(self._key)
+        if fields is not None and field in fields:
+            return fields[field]
+        return self._conf[field]
+
+    def __setitem__(self, field, value):
+        self._overlay.overrides.setdefault(self._key, {})[field] = value
+
+    def __iter__(self):
+        yield from self._conf
+        for field in self._overlay.overrides.get(self._key, ()):
+            if field not in self._conf:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,181 @@
+# core/market_state.py
+import numpy as np
+
+# -----------------------------
+# Représentation compacte d'un marché
+# -----------------------------
+# Les acheteurs × produits sont rangés dans des tableaux NumPy (B, P) ;
+# mask[b, p] indique une enchère réelle. Les enregistrements BuyerRecord /
+# ProductRecord gardent les identifiants et l'ordre des enchères de chaque
+# acheteur, pour revenir exactement au format dict (from_dicts / to_buyers).
+
+
+class BuyerRecord:
+    __slots__ = ("name", "auto_bid", "index", "product_order")
+
+    def __init__(self, name, auto_bid, index, product_order):
+        self.name = name
+        self.auto_bid = auto_bid
+        self.index = index
+        # Indices produits dans l'ordre des enchères de l'acheteur
+        self.product_order = product_order
+
+
+class ProductRecord:
+    __slots__ = ("id", "index")
+
+    def __init__(self, id, index):
+        self.id = id
+        self.index = index
+
+
+class MarketState:
+    __slots__ = (
+        "buyers", "products", "buyer_index", "product_index",
+        "price", "max_price", "qty_desired", "moq", "mask",
+        "stock", "volume_multiple",
+    )
+
+    def __init__(self, buyers, products):
+        self.buyers = buyers
+        self.products = products
+        self.buyer_index = {b.name: b.index for b in buyers}
+        self.product_index = {p.id: p.index for p in products}
+
+        shape = (len(buyers), len(products))
+        self.price = np.zeros(shape)
+        self.max_price = np.zeros(shape)
+        self.qty_desired = np.zeros(shape)
+        self.moq = np.zeros(shape)
+        self.mask = np.zeros(shape, dtype=bool)
+        self.stock = np.zeros(len(products))
+        self.volume_multiple = np.zeros(len(products))
+
+    # -----------------------------
+    # Conversion depuis / vers le format dict
+    # -----------------------------
+    @classmethod
+    def from_dicts(cls, buyers, products):
+        products = list(products)
+        buyers = list(buyers)
+        product_records = [ProductRecord(p["id"], j) for j, p in enumerate(products)]
+        product_index = {p.id: p.index for p in product_records}
+
+        buyer_records = []
+        rows, cols, bids = [], [], []
+        for i, buyer in enumerate(buyers):
+            order = []
+            for prod_id, prod_conf in buyer["products"].items():
+                j = product_index[prod_id]
+                order.append(j)
+                rows.append(i)
+                cols.append(j)
+                bids.append((
+                    prod_conf["current_price"],
+                    prod_conf.get("max_price", prod_conf["current_price"]),
+                    prod_conf["qty_desired"],
+                    prod_conf["moq"],
+                ))
+            buyer_records.append(BuyerRecord(buyer["name"], buyer.get("auto_bid", False), i, order))
+
+        state = cls(buyer_records, product_records)
+        state.stock[:] = [p["stock"] for p in products]
+        state.volume_multiple[:] = [p["volume_multiple"] for p in products]
+        if bids:
+            values = np.array(bids, dtype=float)
+            state.price[rows, cols] = values[:, 0]
+            state.max_price[rows, cols] = values[:, 1]
+            state.qty_desired[rows, cols] = values[:, 2]
+            state.moq[rows, cols] = values[:, 3]
+            state.mask[rows, cols] = True
+        return state
+
+    def to_buyers(self):
+        """Acheteurs au format dict de core/ (ordre des enchères conservé)"""
+        price = self.price.tolist()
+        max_price = self.max_price.tolist()
+        qty_desired = self.qty_desired.tolist()
+        moq = self.moq.tolist()
+        buyers = []
+        for b in self.buyers:
+            i = b.index
+            buyers.append({
+                "name": b.name,
+                "auto_bid": b.auto_bid,
+                "products": {
+                    self.products[j].id: {
+                        "qty_desired": _number(qty_desired[i][j]),
+                        "current_price": price[i][j],
+                        "max_price": max_price[i][j],
+                        "moq": _number(moq[i][j]),
+                    }
+                    for j in b.product_order
+                },
+            })
+        return buyers
+
+    def set_price(self, buyer_name, prod_id, price):
+        self.price[self.buyer_index[buyer_name], self.product_index[prod_id]] = price
+
+    # -----------------------------
+    # Calculs vectorisés
+    # -----------------------------
+    def max_units(self):
+        """
+        (B, P) : multiples de volume maximaux de chaque enchère (stock et
+        quantité désirée), 0 sans enchère ou si la MOQ produit est inatteignable.
+        Même règle que allocation_algo.bid_max_units.
+        """
+        vm = self.volume_multiple
+        valid_vm = vm > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            units = np.floor(np.minimum(self.stock, self.qty_desired) / np.where(valid_vm, vm, 1))
+        units[:, ~valid_vm] = 0
+        units[~self.mask] = 0
+        units[units * vm < self.moq] = 0
+        return units.astype(np.int64)
+
+    def bid_order(self):
+        """
+        Indices des acheteurs par prix max le plus haut décroissant, à égalité
+        dans l'ordre d'origine (comme sorted(..., reverse=True)).
+        """
+        if not self.buyers:
+            return []
+        best = np.where(self.mask, self.max_price, -np.inf).max(axis=1)
+        return np.argsort(-best, kind="stable").tolist()
+
+    def round_allocations(self, quantities, seller_global_moq):
+        """
+        Arrondit les quantités (B, P) aux multiples de volume et annule les
+        acheteurs sous la MOQ globale, renvoie (allocations (B, P), total_ca).
+        """
+        vm = self.volume_multiple
+        valid_vm = vm > 0
+        rounded = np.where(
+            valid_vm,
+            np.round(quantities / np.where(valid_vm, vm, 1)) * vm,
+            np.trunc(quantities),
+        )
+        rounded[~self.mask] = 0
+        rounded[rounded.sum(axis=1) < seller_global_moq] = 0
+        return rounded, float((rounded * self.price).sum())
+
+    def allocations_dict(self, allocations):
+        """Allocations (B, P) au format {acheteur: {produit: quantité}}"""
+        rows = allocations.astype(np.int64).tolist()
+        return {
+            b.name: {self.products[j].id: rows[b.index][j] for j in b.product_order}
+            for b in self.buyers
+        }
+
+
+def bid_order(buyers, products):
+    """Acheteurs (dicts) dans l'ordre de passage de l'auto-bid, voir MarketState.bid_order"""
+    buyers = list(buyers)
+    return [buyers[i] for i in MarketState.from_dicts(buyers, products).bid_order()]
+
+
+def _number(value):
+    """Entier si la valeur est entière (les quantités du format dict sont des int)"""
+    return int(value) if float(value).is_integer() else value
@@ -0,0 +1,79 @@
+# core/presolve.py
+import os
+import numpy as np
+
+# -----------------------------
+# Presolve du MILP d'allocation
+# -----------------------------
+# Avant construction du modèle, les enchères dont l'issue ne dépend pas du
+# solveur sont retirées ou fixées, sur les tableaux de MarketState :
+# - enchère inatteignable (MOQ produit au-delà de la quantité désirée ou du
+#   stock, en multiples de volume) : 0 ;
+# - acheteur dont toutes les enchères atteignables ne font pas la MOQ
+#   globale : 0 partout ;
+# - produit non disputé (la demande atteignable restante tient dans le
+#   stock) : un acheteur qui atteint la MOQ globale sur ses seuls produits
+#   non disputés y reçoit sa quantité maximale (toute solution optimale la
+#   lui donne, les prix étant positifs) et sa MOQ globale est acquise ;
+# - acheteur avec une seule enchère restante : la MOQ globale devient la
+#   MOQ de cette enchère (ni variable z ni ligne globale).
+# Aucune de ces règles ne dépend des prix : un presolve reste valable tant
+# que les acheteurs et leurs quantités ne changent pas (auto-bid).
+#
+# ALLOCATION_PRESOLVE : "on" (défaut) ou "off".
+
+PRESOLVE_ENABLED = os.environ.get("ALLOCATION_PRESOLVE", "on") != "off"
+
+
+class Presolve:
+    """
+    Presolve d'un MarketState, tableaux alignés sur ses acheteurs et produits :
+    units (B, P)   multiples de volume maximaux des enchères laissées au solveur
+    fixed (B, P)   multiples de volume fixés (enchères retirées du modèle)
+    active (B,)    MOQ globale acquise par les enchères fixées
+    single (B,)    une seule enchère restante, MOQ globale reportée sur elle
+    """
+
+    def __init__(self, state, seller_global_moq):
+        self.state = state
+        vm = state.volume_multiple
+        units = state.max_units()
+        self.unreachable = state.mask & (units == 0)
+
+        reachable_qty = (units * vm).sum(axis=1)
+        self.below_global_moq = (reachable_qty > 0) & (reachable_qty < seller_global_moq)
+        units[self.below_global_moq] = 0
+
+        bids = units > 0
+        self.uncontended = bids.any(axis=0) & ((units * vm).sum(axis=0) <= state.stock)
+        free_qty = (units * vm)[:, self.uncontended].sum(axis=1)
+        self.active = (free_qty > 0) & (free_qty >= seller_global_moq)
+
+        self.fixed = np.where(self.active[:, None] & self.uncontended[None, :], units, 0)
+        self.units = units - self.fixed
+        self.single = ~self.active & ((self.units > 0).sum(axis=1) == 1)
+
+    def summary(self):
+        """Nombre d'enchères et d'acheteurs retirés ou fixés, et taille du reste envoyé au solveur"""
+        residual = self.units > 0
+        return {
+            "unreachable_bids": int(self.unreachable.sum()),
+            "buyers_below_global_moq": int(self.below_global_moq.sum()),
+            "uncontended_products": int(self.uncontended.sum()),
+            "fixed_bids": int((self.fixed > 0).sum()),
+            "residual_bids": int(residual.sum()),
+            "residual_buyers": int(residual.any(axis=1).sum()),
+        }
+
+    def removed(self):
+        """Détail de ce qui a été retiré : {"unreachable_bids", "buyers_below_global_moq", "fixed_bids"}"""
+        buyers = self.state.buyers
+        products = self.state.products
+        return {
+            "unreachable_bids": [(buyers[i].name, products[j].id) for i, j in np.argwhere(self.unreachable)],
+            "buyers_below_global_moq": [buyers[i].name for i in np.flatnonzero(self.below_global_moq)],
+            "fixed_bids": {
+                (buyers[i].name, products[j].id): int(self.fixed[i, j] * self.state.volume_multiple[j])
+                for i, j in np.argwhere(self.fixed > 0)
+            },
+        }
@@ -0,0 +1,242 @@
+# core/price_estimate.py
+import time
+import pulp
+from core import instrumentation
+from core.allocation_algo import bid_max_units
+from core.market_overlay import MarketOverlay
+from core.solvers import get_solver
+
+# -----------------------------
+# Estimation instantanée du prix de clôture
+# -----------------------------
+# simulate_optimal_bid rejoue tout l'auto-bid pour trouver le prix qui donne
+# 100 % des quantités. Ici, une seule résolution de la relaxation LP du
+# marché concurrent (sans MOQ ni multiples entiers), chaque enchère au prix
+# que son acheteur peut atteindre (prix max s'il est en auto-bid) :
+# - la valeur duale de la ligne de stock d'un produit est le prix de la
+#   dernière unité servie ;
+# - pour obtenir q unités au-delà du stock libre, il faut évincer les
+#   enchères servies les moins chères : le prix de la dernière enchère
+#   évincée (+ un tick) est le prix estimé.
+# L'estimation est marquée "confident" quand la relaxation ne peut pas
+# s'écarter du MILP sur ce produit (quantités en multiples entiers, MOQ des
+# enchères évincées respectées, MOQ globale atteinte).
+
+TICK = 0.01
+
+
+def _reachable_price(prod_conf, auto_bid):
+    current_price = prod_conf["current_price"]
+    if auto_bid:
+        return max(current_price, prod_conf.get("max_price", current_price))
+    return current_price
+
+
+def _relaxation(competitors, products_by_id):
+    """LP des concurrents : x continu borné par la quantité atteignable, une ligne de stock par produit"""
+    model = pulp.LpProblem("Price_Estimate", pulp.LpMaximize)
+    bids = []
+    revenue_terms = []
+    stock_terms = {}
+
+    for buyer in competitors:
+        for prod_id, prod_conf in buyer["products"].items():
+            product = products_by_id.get(prod_id)
+            if product is None:
+                continue
+            max_units = bid_max_units(prod_conf, product)
+            if max_units == 0:
+                continue
+            price = _reachable_price(prod_conf, buyer.get("auto_bid", False))
+            x = pulp.LpVariable(f"x_{len(bids)}", lowBound=0, upBound=max_units * product["volume_multiple"])
+            bids.append({"buyer": buyer["name"], "product": prod_id, "price": price, "moq": prod_conf["moq"], "x": x})
+            revenue_terms.append(price * x)
+            stock_terms.setdefault(prod_id, []).append(x)
+
+    model += pulp.lpSum(revenue_terms)
+    stock_rows = {}
+    for prod_id, terms in stock_terms.items():
+        stock_rows[prod_id] = pulp.lpSum(terms) <= products_by_id[prod_id]["stock"]
+        model += stock_rows[prod_id], f"stock_{prod_id}"
+    return model, bids, stock_rows
+
+
+def estimate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name="__SIMULATION__",
+                         seller_global_moq=80, solver=None, verify=False):
+    """
+    Prix estimé par produit pour obtenir user_qtys, en une résolution LP.
+    Renvoie {produit: {"recommended_price", "recommended_qty", "shadow_price",
+    "confident", "verified"}} ; verified vaut None sans vérification, sinon
+    le résultat d'une seule résolution exacte aux prix estimés, les
+    concurrents en auto-bid à leur prix max.
+    """
+    products_by_id = {p["id"]: p for p in products}
+    competitors = [b for b in buyers if b["name"] != new_buyer_name]
+
+    with instrumentation.span("recommendation", products=len(user_qtys), mode="dual"):
+        start = time.perf_counter()
+        model, bids, stock_rows = _relaxation(competitors, products_by_id)
+        if bids:
+            model.solve(get_solver(solver))
+        instrumentation.record_solve("estimate_optimal_bid", "lp", solve_s=time.perf_counter() - start)
+
+        served = {}
+        totals = {}
+        for bid in bids:
+            bid["qty"] = bid["x"].value() or 0.0
+            totals[bid["buyer"]] = totals.get(bid["buyer"], 0.0) + bid["qty"]
+            if bid["qty"] > 0:
+                served.setdefault(bid["product"], []).append(bid)
+
+        user_total = sum(user_qtys.values())
+        recommendations = {}
+        for pid, qty in user_qtys.items():
+            product = products_by_id[pid]
+            volume_multiple = product["volume_multiple"]
+            row = stock_rows.get(pid)
+            shadow_price = (row.pi or 0.0) if row is not None and bids else 0.0
+
+            confident = qty <= product["stock"] and user_total >= seller_global_moq
+            if volume_multiple > 0 and qty % volume_multiple:
+                confident = False
+
+            product_bids = served.get(pid, [])
+            free_stock = product["stock"] - sum(b["qty"] for b in product_bids)
+            needed = min(qty, product["stock"]) - free_stock
+
+            marginal_price = 0.0
+            if needed > 1e-9:
+                # Évince d'abord les enchères servies les moins chères
+                for bid in sorted(product_bids, key=lambda b: b["price"]):
+                    displaced = min(bid["qty"], needed)
+                    needed -= displaced
+                    marginal_price = bid["price"]
+                    remaining = bid["qty"] - displaced
+                    if volume_multiple > 0 and bid["qty"] % volume_multiple:
+                        confident = False
+                    if 0 < remaining < bid["moq"]:
+                        confident = False
+                    if 0 < totals[bid["buyer"]] - displaced < seller_global_moq:
+                        confident = False
+                    if needed <= 1e-9:
+                        break
+                price = round(max(marginal_price, shadow_price) + TICK, 2)
+            else:
+                price = 0.0
+
+            recommendations[pid] = {
+                "recommended_price": max(round(user_prices.get(pid, 0), 2), price),
+                "recommended_qty": qty,
+                "shadow_price": round(shadow_price, 6),
+                "confident": confident,
+                "verified": None,
+            }
+
+        if verify:
+            _verify(competitors, products, recommendations, new_buyer_name, seller_global_moq, solver)
+
+    return recommendations
+
+
+def _verify(competitors, products, recommendations, new_buyer_name, seller_global_moq, solver):
+    """Une résolution exacte aux prix estimés, concurrents en auto-bid à leur prix max"""
+    from core.solve_cache import cached_solve_model
+
+    overlay = MarketOverlay(competitors)
+    for buyer in overlay.buyers():
+        if buyer.get("auto_bid", False):
+            for prod_conf in buyer["products"].values():
+                prod_conf["current_price"] = _reachable_price(prod_conf, True)
+
+    moqs = {p["id"]: p["seller_moq"] for p in products}
+    overlay.add_buyer({
+        "name": new_buyer_name,
+        "auto_bid": False,
+        "products": {
+            pid: {
+                "qty_desired": rec["recommended_qty"],
+                "current_price": rec["recommended_price"],
+                "max_price": rec["recommended_price"],
+                "moq": moqs[pid],
+            }
+            for pid, rec in recommendations.items()
+        },
+    })
+    allocations, _ = cached_solve_model(overlay.buyers(), products, seller_global_moq, solver=solver)
+    for pid, rec in recommendations.items():
+        rec["verified"] = allocations[new_buyer_name].get(pid, 0) >= rec["recommended_qty"]
+
+
+# -----------------------------
+# Courbe prix -> quantité obtenable
+# -----------------------------
+def price_quantity_curves(buyers, products, new_buyer_name=None):
+    """
+    Pour chaque produit, fonction en escalier "quantité obtenable selon le
+    prix offert" face aux enchères de buyers (même relaxation que
+    estimate_optimal_bid : chaque concurrent peut monter jusqu'au prix qu'il
+    atteint). Renvoie {produit: [{"price", "qty"}]} par prix croissant : à
+    partir de price, on obtient qty (multiple de volume).
+    Indicatif seulement : les MOQ produit et la MOQ globale (de l'acheteur
+    comme des concurrents) sont ignorées, l'allocation réelle peut donc
+    donner moins (quantité sous la MOQ) ou plus (concurrent évincé en entier).
+    Un seul tri des enchères par produit.
+    """
+    products_by_id = {p["id"]: p for p in products}
+    demand = {pid: [] for pid in products_by_id}
+
+    for buyer in buyers:
+        if buyer["name"] == new_buyer_name:
+            continue
+        auto_bid = buyer.get("auto_bid", False)
+        for prod_id, prod_conf in buyer["products"].items():
+            product = products_by_id.get(prod_id)
+            if product is None:
+                continue
+            max_units = bid_max_units(prod_conf, product)
+            if max_units:
+                demand[prod_id].append((_reachable_price(prod_conf, auto_bid), max_units * product["volume_multiple"]))
+
+    curves = {}
+    for prod_id, bids in demand.items():
+        product = products_by_id[prod_id]
+        stock = product["stock"]
+        volume_multiple = product["volume_multiple"]
+        # Demande concurrente servie avant nous tant qu'on ne la dépasse pas
+        outbidding = sum(qty for _, qty in bids)
+
+        steps = []
+        price = 0.0
+        for bid_price, qty in sorted(bids) + [(None, 0)]:
+            obtainable = max(0, stock - outbidding)
+            if volume_multiple > 0:
+                obtainable -= obtainable % volume_multiple
+            if steps and steps[-1]["price"] == price:
+                # Enchères concurrentes au même prix : une seule marche
+                steps[-1]["qty"] = obtainable
+            elif not steps or obtainable > steps[-1]["qty"]:
+                steps.append({"price": price, "qty": obtainable})
+            if bid_price is None:
+                break
+            outbidding -= qty
+            price = round(bid_price + TICK, 2)
+        curves[prod_id] = steps
+    return curves
+
+
+def curve_qty(curve, price):
+    """Quantité obtenable au prix offert"""
+    qty = 0
+    for step in curve:
+        if step["price"] > price:
+            break
+        qty = step["qty"]
+    return qty
+
+
+def curve_price(curve, qty):
+    """Plus petit prix qui donne qty, None si qty n'est jamais atteignable"""
+    for step in curve:
+        if step["qty"] >= qty:
+            return step["price"]
+    return None
@@ -0,0 +1,110 @@
+# core/price_oracle.py
+import math
+from core.allocation_algo import bisect_price
+
+# -----------------------------
+# Oracle de prix critique
+# -----------------------------
+# Quand seul le prix p d'une enchère (acheteur B, produit P) varie, chaque
+# allocation possible s vaut g(s) + p * x(s), avec x(s) la quantité de B sur P
+# et g(s) le reste du chiffre d'affaires. Le revenu optimal est l'enveloppe
+# supérieure de ces droites : x est croissant en p et ne change qu'aux
+# intersections. Deux résolutions donnent deux droites, leur intersection
+# est le seul prix où l'allocation peut basculer entre elles ; une résolution
+# à ce prix confirme la cassure ou révèle une droite intermédiaire.
+# On trouve ainsi les seuils exacts en quelques résolutions, sans balayer
+# les prix.
+
+def _line(model, buyer_name, prod_id, price):
+    """Résout au prix donné, renvoie la droite (x, g) de l'allocation optimale"""
+    model.update_price(buyer_name, prod_id, price)
+    allocations, total_ca = model.solve()
+    alloc = allocations[buyer_name][prod_id]
+    return alloc, total_ca - price * alloc
+
+
+def _crossing(line_a, line_b):
+    return (line_a[1] - line_b[1]) / (line_b[0] - line_a[0])
+
+
+def _on_envelope(line, others, price):
+    """Vrai si aucune autre droite ne dépasse line au prix donné"""
+    value = line[1] + price * line[0]
+    return all(o[1] + price * o[0] <= value + 1e-6 * max(1.0, abs(value)) for o in others)
+
+
+def price_breakpoints(model, buyer_name, prod_id, low_price, high_price):
+    """
+    Tous les prix de [low_price, high_price] où l'allocation de l'acheteur
+    sur le produit change, avec la quantité avant/après chaque seuil.
+    2k + 1 résolutions pour k seuils. Le prix initial est restauré.
+    """
+    initial_price = model.buyers[buyer_name]["products"][prod_id]["current_price"]
+
+    low_line = _line(model, buyer_name, prod_id, low_price)
+    high_line = _line(model, buyer_name, prod_id, high_price)
+
+    breakpoints = []
+    stack = [(low_line, high_line)]
+    while stack:
+        left, right = stack.pop()
+        if left[0] == right[0]:
+            continue
+
+        price = _crossing(left, right)
+        middle = _line(model, buyer_name, prod_id, price)
+        if _on_envelope(left, [middle], price):
+            breakpoints.append({
+                "price": round(price, 6),
+                "qty_before": left[0],
+                "qty_after": right[0],
+            })
+            continue
+        stack.append((left, middle))
+        stack.append((middle, right))
+
+    model.update_price(buyer_name, prod_id, initial_price)
+    return sorted(breakpoints, key=lambda b: b["price"])
+
+
+def critical_price(model, buyer_name, prod_id, low_price, high_price, target_alloc, tick=0.01):
+    """
+    Plus petit prix sur la grille du tick donnant target_alloc à l'acheteur,
+    ou None si high_price ne suffit pas. Le prix trouvé est laissé dans le
+    modèle. Le candidat est vérifié par une résolution exacte ; en cas de
+    désaccord (arrondis du post-traitement), on termine par dichotomie.
+    """
+    low_line = _line(model, buyer_name, prod_id, low_price)
+    if low_line[0] >= target_alloc:
+        return low_price
+
+    high_line = _line(model, buyer_name, prod_id, high_price)
+    if high_line[0] < target_alloc:
+        return None
+
+    while high_price - low_price > tick:
+        price = _crossing(low_line, high_line)
+        middle = _line(model, buyer_name, prod_id, price)
+        if _on_envelope(low_line, [middle], price):
+            break
+        if middle[0] >= target_alloc:
+            high_price, high_line = price, middle
+        else:
+            low_price, low_line = price, middle
+    else:
+        price = high_price
+
+    # Premier prix de la grille strictement au-dessus du seuil
+    candidate = min((math.floor(price / tick + 1e-9) + 1) * tick, high_price)
+    candidate = round(max(candidate, low_price), 6)
+
+    allocations, _ = _solve_at(model, buyer_name, prod_id, candidate)
+    if allocations[buyer_name][prod_id] >= target_alloc:
+        return candidate
+
+    return bisect_price(model, buyer_name, prod_id, candidate, high_price, target_alloc, tick)
+
+
+def _solve_at(model, buyer_name, prod_id, price):
+    model.update_price(buyer_name, prod_id, price)
+    return model.solve()
@@ -1,12 +1,42 @@
-import copy
-from core.allocation_algo import solve_model
+import os
+from core import instrumentation
+from core.market_overlay import MarketOverlay
+from core.budget import out_of_time
+from core.market_state import bid_order
+from core.price_estimate import estimate_optimal_bid
+from core.solve_cache import cached_solve_model
+from core.warm_start import make_warm_start
 
-def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name="__SIMULATION__", max_rounds=30):
+# Mode de recommandation : "auction" (auto-bid complet) ou "dual" (estimation LP)
+DEFAULT_MODE = os.environ.get("RECOMMENDATION_MODE", "auction")
+MODES = ("auction", "dual")
+
+def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name="__SIMULATION__", max_rounds=30, solver=None,
+                         mode=None, verify=False, warm_start=None, budget=None):
     """
     Simule le prix minimal à proposer pour atteindre les quantités désirées.
-    Utilise la même logique que run_auto_bid_aggressive.
+    mode="auction" : même logique que run_auto_bid_aggressive.
+    mode="dual"    : estimation en une résolution LP (core/price_estimate.py),
+                     avec indicateur de confiance ; verify=True contrôle les
+                     prix estimés par une résolution exacte.
+    warm_start : "off", "on" ou "cutoff" pour les résolutions du mode
+    "auction", voir core/warm_start.py.
+    budget : SolveBudget (core/budget.py) du mode "auction" ; une fois
+    épuisé, la recherche s'arrête et chaque prix recommandé est au moins
+    l'estimation du mode "dual".
     """
-    buyers_copy = copy.deepcopy(buyers)
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"Mode de recommandation inconnu : {mode}")
+    if mode == "dual":
+        return estimate_optimal_bid(
+            buyers, products, user_qtys, user_prices, new_buyer_name, solver=solver, verify=verify
+        )
+
+    warm = make_warm_start(warm_start)
+
+    # Les essais de prix n'écrivent que dans le calque, buyers n'est pas modifié
+    overlay = MarketOverlay(buyers)
     recommendations = {}
 
     min_step = 0.1
@@ -25,50 +55,51 @@ def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_nam
             "max_price": 1e6,
             "moq": next(p["seller_moq"] for p in products if p["id"] == pid)
         }
-    buyers_copy.append(temp_buyer)
+    overlay.add_buyer(temp_buyer)
+    buyers_copy = overlay.buyers()
 
     # Auto-bid sur copie
-    for _ in range(max_rounds):
-        changes_made = False
-        buyers_sorted = sorted(
-            buyers_copy,
-            key=lambda b: max(p["max_price"] for p in b["products"].values()),
-            reverse=True
-        )
+    # Les prix max ne bougent pas pendant la simulation : ordre calculé une fois
+    buyers_sorted = bid_order(buyers_copy, products)
 
-        for buyer in buyers_sorted:
-            if not buyer.get("auto_bid", False):
-                continue
-            for pid, prod_conf in buyer["products"].items():
-                current_price = prod_conf["current_price"]
-                max_price = prod_conf["max_price"]
-                qty_desired = prod_conf["qty_desired"]
-
-                allocations, _ = solve_model(buyers_copy, products)
-                current_alloc = allocations[buyer["name"]].get(pid, 0)
-                if current_alloc >= qty_desired:
+    with instrumentation.span("recommendation", products=len(user_qtys), mode="auction"):
+        for _ in range(max_rounds):
+            changes_made = False
+            for buyer in buyers_sorted:
+                if not buyer.get("auto_bid", False):
                     continue
+                for pid, prod_conf in buyer["products"].items():
+                    if out_of_time(budget):
+                        break
+                    current_price = prod_conf["current_price"]
+                    max_price = prod_conf["max_price"]
+                    qty_desired = prod_conf["qty_desired"]
+
+                    allocations, _ = cached_solve_model(buyers_copy, products, solver=solver, warm_start=warm, budget=budget)
+                    current_alloc = allocations[buyer["name"]].get(pid, 0)
+                    if current_alloc >= qty_desired:
+                        continue
 
-                test_price = current_price
-                while test_price < max_price:
-                    step = max(min_step, test_price * pct_step)
-                    next_price = min(test_price + step, max_price)
-                    prod_conf["current_price"] = next_price
+                    test_price = current_price
+                    while test_price < max_price and not out_of_time(budget):
+                        step = max(min_step, test_price * pct_step)
+                        next_price = min(test_price + step, max_price)
+                        prod_conf["current_price"] = next_price
 
-                    new_allocs, _ = solve_model(buyers_copy, products)
-                    new_alloc = new_allocs[buyer["name"]].get(pid, 0)
+                        new_allocs, _ = cached_solve_model(buyers_copy, products, solver=solver, warm_start=warm, budget=budget)
+                        new_alloc = new_allocs[buyer["name"]].get(pid, 0)
 
-                    if new_alloc >= qty_desired:
+                        if new_alloc >= qty_desired:
+                            test_price = next_price
+                            changes_made = True
+                            break
                         test_price = next_price
                         changes_made = True
-                        break
-                    test_price = next_price
-                    changes_made = True
 
-                prod_conf["current_price"] = round(test_price, 2)
+                    prod_conf["current_price"] = round(test_price, 2)
 
-        if not changes_made:
-            break
+            if not changes_made or out_of_time(budget):
+                break
 
     # Retourne les recommandations
     for pid in user_qtys:
@@ -77,4 +108,10 @@ def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_nam
             "recommended_qty": temp_buyer["products"][pid]["qty_desired"]
         }
 
+    if budget is not None and budget.truncated:
+        # Recherche interrompue : le prix atteint peut être trop bas
+        estimates = estimate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name, solver=solver)
+        for pid, rec in recommendations.items():
+            rec["recommended_price"] = max(rec["recommended_price"], estimates[pid]["recommended_price"])
+
     return recommendations
@@ -1,7 +1,7 @@
 import copy
-from core.allocation_algo import solve_model
+from core.solve_cache import cached_solve_model
 
-def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name="__SIMULATION__", max_rounds=30):
+def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_name="__SIMULATION__", max_rounds=30, solver=None):
     """
     Simule le prix minimal à proposer pour atteindre les quantités désirées.
     Utilise la même logique que run_auto_bid_aggressive.
@@ -44,7 +44,7 @@ def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_nam
                 max_price = prod_conf["max_price"]
                 qty_desired = prod_conf["qty_desired"]
 
-                allocations, _ = solve_model(buyers_copy, products)
+                allocations, _ = cached_solve_model(buyers_copy, products, solver=solver)
                 current_alloc = allocations[buyer["name"]].get(pid, 0)
                 if current_alloc >= qty_desired:
                     continue
@@ -55,7 +55,7 @@ def simulate_optimal_bid(buyers, products, user_qtys, user_prices, new_buyer_nam
                     next_price = min(test_price + step, max_price)
                     prod_conf["current_price"] = next_price
 
-                    new_allocs, _ = solve_model(buyers_copy, products)
+                    new_allocs, _ = cached_solve_model(buyers_copy, products, solver=solver)
                     new_alloc = new_allocs[buyer["name"]].get(pid, 0)
 
                     if new_alloc >= qty_desired:
@@ -0,0 +1,187 @@
+# core/solve_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from core import instrumentation
+from core.allocation_algo import solve_model
+
+# -----------------------------
+# Clé canonique d'un marché
+# -----------------------------
+def market_key(buyers, products, seller_global_moq=80):
+    """
+    Encodage hashable de tout ce qui influence solve_model :
+    (prix, qty_desired, moq) par enchère, (stock, volume_multiple) par produit
+    et le MOQ global. L'ordre des acheteurs est conservé, celui des produits non.
+    """
+    product_part = tuple(sorted(
+        (p["id"], p["stock"], p["volume_multiple"]) for p in products
+    ))
+    buyer_part = tuple(
+        (
+            b["name"],
+            tuple(sorted(
+                (pid, conf["current_price"], conf["qty_desired"], conf["moq"])
+                for pid, conf in b["products"].items()
+            )),
+        )
+        for b in buyers
+    )
+    return (seller_global_moq, product_part, buyer_part)
+
+
+def _copy_result(result):
+    allocations, total_ca = result
+    return {name: dict(alloc) for name, alloc in allocations.items()}, total_ca
+
+
+# -----------------------------
+# Cache LRU (+ niveau disque optionnel)
+# -----------------------------
+class SolveCache:
+    """
+    Cache LRU borné des résultats (allocations, total_ca) de solve_model.
+    Si path est donné, les résultats sont aussi écrits dans un fichier SQLite
+    local pour rester chauds entre deux redémarrages de Streamlit.
+    """
+
+    def __init__(self, maxsize=2048, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self.attach(path)
+
+    def attach(self, path):
+        """
+        Active le niveau disque sur le fichier SQLite path, partageable entre
+        processus (journal WAL, attente du verrou d'écriture).
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self.path = path
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS solve_cache (key TEXT PRIMARY KEY, result TEXT)"
+            )
+            self._db.commit()
+
+    def reopen(self):
+        """
+        Dans un processus fils : nouvelle connexion au niveau disque, la
+        connexion et le verrou hérités du parent ne devant pas être utilisés.
+        """
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self.attach(self.path)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_result(self._entries[key])
+
+            result = self._disk_get(key)
+            if result is not None:
+                self.disk_hits += 1
+                self._remember(key, result)
+                return _copy_result(result)
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            result = _copy_result(result)
+            self._remember(key, result)
+            self._disk_put(key, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM solve_cache")
+                self._db.commit()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    # -----------------------------
+    # Utilitaires internes
+    # -----------------------------
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _disk_key(self, key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT result FROM solve_cache WHERE key = ?", (self._disk_key(key),)
+        ).fetchone()
+        if row is None:
+            return None
+        allocations, total_ca = json.loads(row[0])
+        return allocations, total_ca
+
+    def _disk_put(self, key, result):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO solve_cache (key, result) VALUES (?, ?)",
+            (self._disk_key(key), json.dumps(result)),
+        )
+        self._db.commit()
+
+
+# Cache partagé par le processus ; ALLOCATION_SOLVE_CACHE active le niveau disque
+SOLVE_CACHE = SolveCache(path=os.environ.get("ALLOCATION_SOLVE_CACHE"))
+
+
+def cached_solve_model(buyers, products, seller_global_moq=80, solver=None, cache=None, warm_start=None, budget=None):
+    """
+    solve_model précédé du cache (par défaut SOLVE_CACHE), warm_start et budget : voir solve_model.
+    Un résultat non prouvé optimal (budget) n'est pas mis en cache, seulement
+    gardé par le budget le temps de l'appel.
+    """
+    if cache is None:
+        cache = SOLVE_CACHE
+    key = market_key(buyers, products, seller_global_moq)
+    result = cache.get(key)
+    if result is None and budget is not None:
+        result = budget.results.get(key)
+    if result is None:
+        result = solve_model(buyers, products, seller_global_moq, solver=solver, warm_start=warm_start, budget=budget)
+        if budget is None or budget.last_status in (None, "optimal"):
+            cache.put(key, result)
+        else:
+            budget.results[key] = result
+    else:
+        instrumentation.record_solve("cached_solve_model", "cache")
+    return result
@@ -0,0 +1,73 @@
+# core/solvers.py
+import os
+import tempfile
+import pulp
+
+# -----------------------------
+# Backends de résolution
+# -----------------------------
+# "cbc"   : binaire CBC lancé en sous-processus (fichier MPS + fichier solution)
+# "highs" : HiGHS en mémoire via highspy, sans processus ni fichier temporaire
+# "auto"  : HiGHS si highspy est installé, sinon CBC
+#
+# Le backend par défaut se choisit via la variable d'environnement
+# ALLOCATION_SOLVER, ou par appel avec l'argument solver=.
+# CBC reste le défaut : voir benchmarks/solver_overhead.py avant de basculer.
+DEFAULT_BACKEND = os.environ.get("ALLOCATION_SOLVER", "cbc")
+
+BACKENDS = ("cbc", "highs", "auto")
+
+
+def _cbc(**options):
+    return pulp.PULP_CBC_CMD(msg=False, **options)
+
+
+def _highs(**options):
+    solver = pulp.HiGHS(msg=False, **options)
+    if not solver.available():
+        return None
+    return solver
+
+
+def get_solver(backend=None, **options):
+    """
+    Renvoie un solveur PuLP pour le backend demandé.
+    Retombe sur CBC si le backend en mémoire n'est pas disponible.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de résolution inconnu : {backend}")
+
+    if backend in ("highs", "auto"):
+        solver = _highs(**options)
+        if solver is not None:
+            return solver
+
+    return _cbc(**options)
+
+
+def cbc_variant(solver, options=(), **settings):
+    """
+    Copie d'un solveur CBC avec des options en plus (solver.copy() de PuLP
+    partage optionsDict et perd timeLimit).
+    """
+    variant = solver.copy()
+    variant.timeLimit = solver.timeLimit
+    variant.options = list(solver.options) + list(options)
+    variant.optionsDict = {**solver.optionsDict, **settings}
+    return variant
+
+
+def solve_with_log(model, solver):
+    """Résout model ; renvoie le journal de CBC (texte), ou "" pour les autres backends"""
+    if not isinstance(solver, pulp.COIN_CMD):
+        model.solve(solver)
+        return ""
+
+    log_file = tempfile.NamedTemporaryFile("r", suffix=".log", delete=False)
+    try:
+        model.solve(cbc_variant(solver, logPath=log_file.name))
+        return log_file.read()
+    finally:
+        log_file.close()
+        os.unlink(log_file.name)
@@ -0,0 +1,92 @@
+# core/warm_start.py
+import os
+import pulp
+from core.solvers import cbc_variant, solve_with_log
+
+# -----------------------------
+# Démarrage à chaud des résolutions MILP
+# -----------------------------
+# Dans la boucle d'auto-bid, deux résolutions successives ne diffèrent que
+# par un coefficient objectif : l'allocation précédente reste réalisable et
+# presque toujours optimale. Elle est passée à CBC comme solution initiale
+# (warmStart / setInitialValue), et en mode "cutoff" son revenu aux nouveaux
+# prix sert de borne : CBC élague tout nœud qui ne peut pas faire mieux.
+# CBC indique dans son journal s'il a pu utiliser la solution initiale ;
+# chaque résolution est comptée acceptée ou rejetée (instrumentation).
+#
+# ALLOCATION_WARM_START : "off" (défaut), "on" ou "cutoff". Seul CBC
+# accepte une solution initiale via PuLP, les autres backends l'ignorent.
+
+DEFAULT_MODE = os.environ.get("ALLOCATION_WARM_START", "off")
+MODES = ("off", "on", "cutoff")
+
+# Marge de la borne, relative au revenu de la solution initiale
+CUTOFF_TOLERANCE = 1e-6
+
+
+def make_warm_start(mode=None):
+    """WarmStart pour le mode demandé (défaut : ALLOCATION_WARM_START), None si "off" """
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"Mode de démarrage à chaud inconnu : {mode}")
+    if mode == "off":
+        return None
+    return WarmStart(cutoff=mode == "cutoff")
+
+
+class WarmStart:
+    """
+    Dernière solution connue d'une suite de résolutions, par nom de variable.
+    Les noms de variables de solve_model et AllocationModel sont stables
+    d'une résolution à l'autre, ce qui permet de la reporter sur un modèle
+    reconstruit.
+    """
+
+    def __init__(self, cutoff=False):
+        self.cutoff = cutoff
+        self.values = {}
+        self.accepted = 0
+        self.rejected = 0
+        # Journal CBC de la dernière résolution (statut, écart, voir core/budget.py)
+        self.last_log = ""
+
+    def solve(self, model, solver):
+        """
+        Résout model avec la dernière solution comme point de départ si le
+        solveur le permet, puis la remplace par la nouvelle.
+        Renvoie "accepted", "rejected" ou None (pas de solution initiale).
+        """
+        variables = model.variables()
+        started = bool(self.values) and isinstance(solver, pulp.COIN_CMD)
+        if not started:
+            self.last_log = solve_with_log(model, solver)
+            self._remember(variables)
+            return None
+
+        for v in variables:
+            value = self.values.get(v.name)
+            v.setInitialValue(value if value is not None else 0)
+
+        options = []
+        if self.cutoff:
+            revenue = model.objective.value() or 0.0
+            # CBC minimise l'opposé de l'objectif d'un problème de maximisation
+            options.append(f"cutoff {-revenue + CUTOFF_TOLERANCE * max(1.0, abs(revenue))}")
+
+        log = solve_with_log(model, cbc_variant(solver, options, warmStart=True))
+        outcome = "accepted" if "MIPStart provided solution" in log else "rejected"
+
+        if self.cutoff and model.status == pulp.LpStatusInfeasible:
+            # Borne trop serrée (ou solution initiale rejetée) : résolution normale
+            log = solve_with_log(model, solver)
+        self.last_log = log
+
+        if outcome == "accepted":
+            self.accepted += 1
+        else:
+            self.rejected += 1
+        self._remember(variables)
+        return outcome
+
+    def _remember(self, variables):
+        self.values = {v.name: v.value() for v in variables}
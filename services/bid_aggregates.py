@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+from services.bid_history import bid_history_size, load_bid_history
+from services.state_manager import DATA_PATH, STATE_BACKEND, load_json, save_json, thaw
+
+# -----------------------------
+# Agrégats de l'historique, tenus à jour à l'écriture
+# -----------------------------
+# bid_aggregates.json (ou la table documents en SQLite) contient, par lot :
+#   latest_round     : {produit: enregistrements du dernier tour}
+#   total_ca         : somme des chiffres d'affaires des derniers tours
+# et history_size, le nombre d'enregistrements pris en compte : s'il ne
+# correspond plus à l'historique (import, écritures concurrentes), les
+# agrégats sont reconstruits en un seul passage. Ce résumé garde une taille
+# bornée : il est réécrit à chaque tour.
+#
+# Le chiffre d'affaires par tour, qui grandit à chaque tour, est tenu en
+# ajout seul : une ligne {"lot_id", "timestamp", "ca"} par lot et par tour
+# dans bid_revenue.jsonl, ou lu directement dans la table d'historique
+# indexée en SQLite. Le journal lu est gardé en mémoire par lot et seules
+# les lignes ajoutées depuis la dernière lecture sont relues.
+
+AGGREGATES_FILE = "bid_aggregates.json"
+REVENUE_LOG = DATA_PATH / "bid_revenue.jsonl"
+
+# Version du format : un fichier d'une version antérieure est reconstruit
+AGGREGATES_VERSION = 2
+
+
+def _empty():
+    return {"version": AGGREGATES_VERSION, "history_size": 0, "lots": {}}
+
+
+def _round_revenue(records):
+    """[{"lot_id", "timestamp", "ca"}] des tours présents dans records"""
+    revenue = {}
+    for record in records:
+        key = (record["lot_id"], record["timestamp"])
+        revenue[key] = revenue.get(key, 0.0) + record["final_price"] * record["qty_allocated"]
+    return [{"lot_id": lot_id, "timestamp": timestamp, "ca": ca} for (lot_id, timestamp), ca in revenue.items()]
+
+
+def _write_revenue(records, mode):
+    if STATE_BACKEND == "sqlite":
+        return
+    lines = "".join(json.dumps(r) + "\n" for r in _round_revenue(records))
+    with _revenue_lock:
+        with open(REVENUE_LOG, mode, encoding="utf-8") as f:
+            f.write(lines)
+        if mode == "w":
+            _revenue_cache.update(_empty_revenue_cache())
+
+
+# Journal bid_revenue.jsonl déjà lu : {"offset", "stat": (mtime, taille), "lots": {lot_id: {timestamp: ca}}}
+def _empty_revenue_cache():
+    return {"offset": 0, "stat": None, "lots": {}}
+
+
+_revenue_cache = _empty_revenue_cache()
+_revenue_lock = threading.Lock()
+
+
+def _read_revenue():
+    """Met _revenue_cache à jour en ne lisant que la fin ajoutée du journal"""
+    try:
+        stat = os.stat(REVENUE_LOG)
+    except FileNotFoundError:
+        _revenue_cache.update(_empty_revenue_cache())
+        return
+    key = (stat.st_mtime_ns, stat.st_size)
+    if key == _revenue_cache["stat"]:
+        return
+    if stat.st_size < _revenue_cache["offset"]:
+        # Journal réécrit ailleurs (reconstruction) : relecture complète
+        _revenue_cache.update(_empty_revenue_cache())
+
+    with open(REVENUE_LOG, "rb") as f:
+        f.seek(_revenue_cache["offset"])
+        tail = f.read()
+    # Une ligne en cours d'écriture sera lue au prochain appel
+    complete = tail[:tail.rfind(b"\n") + 1]
+    for line in complete.splitlines():
+        entry = json.loads(line)
+        revenue = _revenue_cache["lots"].setdefault(entry["lot_id"], {})
+        revenue[entry["timestamp"]] = revenue.get(entry["timestamp"], 0.0) + entry["ca"]
+    _revenue_cache["offset"] += len(complete)
+    _revenue_cache["stat"] = key if len(complete) == len(tail) else None
+
+
+def _apply(aggregates, records):
+    touched = set()
+    for record in records:
+        lot = aggregates["lots"].setdefault(record["lot_id"], {"latest_round": {}, "total_ca": 0.0})
+        timestamp = record["timestamp"]
+
+        latest = lot["latest_round"].get(record["product"])
+        if latest is None or timestamp > latest[0]["timestamp"]:
+            lot["latest_round"][record["product"]] = [record]
+        elif timestamp == latest[0]["timestamp"]:
+            latest.append(record)
+        touched.add(record["lot_id"])
+
+    for lot_id in touched:
+        lot = aggregates["lots"][lot_id]
+        lot["total_ca"] = sum(
+            h["final_price"] * h["qty_allocated"]
+            for records in lot["latest_round"].values() for h in records
+        )
+    aggregates["history_size"] += len(records)
+
+
+def rebuild_aggregates():
+    aggregates = _empty()
+    history = load_bid_history()
+    _apply(aggregates, history)
+    _write_revenue(history, "w")
+    save_json(AGGREGATES_FILE, aggregates)
+    return aggregates
+
+
+def _read():
+    try:
+        return load_json(AGGREGATES_FILE)
+    except FileNotFoundError:
+        return None
+
+
+def load_aggregates():
+    """Agrégats à jour (reconstruits si l'historique a changé sans eux)"""
+    aggregates = _read()
+    if not _current(aggregates) or aggregates["history_size"] != bid_history_size():
+        aggregates = rebuild_aggregates()
+    return aggregates
+
+
+def _current(aggregates):
+    return aggregates is not None and aggregates.get("version") == AGGREGATES_VERSION
+
+
+def update_aggregates(records):
+    """À appeler juste après l'ajout de records à l'historique, coût proportionnel aux lots touchés"""
+    aggregates = _read()
+    if not _current(aggregates) or aggregates["history_size"] + len(records) != bid_history_size():
+        rebuild_aggregates()
+        return
+    aggregates = thaw(aggregates)
+    _apply(aggregates, records)
+    _write_revenue(records, "a")
+    save_json(AGGREGATES_FILE, aggregates)
+
+
+def clear_aggregates():
+    _write_revenue([], "w")
+    save_json(AGGREGATES_FILE, _empty())
+
+
+def _revenue_by_round(lot_id):
+    if STATE_BACKEND == "sqlite":
+        from services import sqlite_store
+        return sqlite_store.revenue_by_round(lot_id)
+    with _revenue_lock:
+        _read_revenue()
+        return sorted(_revenue_cache["lots"].get(lot_id, {}).items())
+
+
+def revenue_by_round(lot_id):
+    """[(timestamp, chiffre d'affaires)] du lot par ordre chronologique, sans relire l'historique"""
+    load_aggregates()
+    return _revenue_by_round(lot_id)
+
+
+def lot_summary(lot_id):
+    """{"latest_round", "total_ca", "revenue_by_round": [(timestamp, ca)]} d'un lot"""
+    lot = load_aggregates()["lots"].get(lot_id)
+    if lot is None:
+        return {"latest_round": {}, "total_ca": 0.0, "revenue_by_round": []}
+    return {
+        "latest_round": lot["latest_round"],
+        "total_ca": lot["total_ca"],
+        "revenue_by_round": _revenue_by_round(lot_id),
+    }
+
+
+def lot_book(lot_id):
+    """
+    Carnet du lot repris du dernier tour enregistré (chaque tour enregistre
+    tout le carnet) : {acheteur: {"name", "auto_bid", "products"}}
+    """
+    products = load_json("products.json")
+    book = {}
+    for records in lot_summary(lot_id)["latest_round"].values():
+        for h in records:
+            buyer = book.setdefault(h["buyer"], {"name": h["buyer"], "auto_bid": True, "products": {}})
+            buyer["products"][h["product"]] = {
+                "qty_desired": h["qty_desired"],
+                "current_price": h["final_price"],
+                "max_price": h["max_price"],
+                "moq": products[h["product"]]["seller_moq"] if h["product"] in products else 0,
+            }
+    return book
@@ -0,0 +1,303 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from services.state_manager import DATA_PATH, STATE_BACKEND, read_json_file
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+# -----------------------------
+# Historique des enchères en ajout seul
+# -----------------------------
+# Chaque enregistrement est une ligne JSON de bids_history.jsonl. Un index
+# annexe (bids_history.idx, une ligne [offset, longueur, lot_id, produit,
+# acheteur, timestamp] par enregistrement) est lui aussi en ajout seul :
+# un ajout coûte O(enregistrements ajoutés), et une lecture filtrée ne lit
+# que l'index puis va chercher les lignes voulues par seek.
+# L'index est relu de façon incrémentale (autres processus) et reconstruit
+# depuis le journal s'il est absent ou incohérent (arrêt brutal entre les
+# deux écritures).
+
+INDEXED_FIELDS = ("lot_id", "product", "buyer")
+_TIMESTAMP = 2 + len(INDEXED_FIELDS)
+
+
+class BidHistoryLog:
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.index_path = path.with_suffix(".idx")
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._reset_index()
+
+    # -----------------------------
+    # Écriture
+    # -----------------------------
+    def append(self, records):
+        """Ajoute les enregistrements en fin de journal (un seul fsync par appel)"""
+        if not records:
+            return
+        with self._lock, self._file_lock(exclusive=True) as data:
+            self._refresh_locked(repair=True)
+            offset = data.seek(0, os.SEEK_END)
+            entries = []
+            for record in records:
+                line = json.dumps(record).encode() + b"\n"
+                data.write(line)
+                entries.append(self._entry(offset, len(line), record))
+                offset += len(line)
+            self._sync(data)
+
+            with open(self.index_path, "ab") as index:
+                index.write(b"".join(json.dumps(e).encode() + b"\n" for e in entries))
+                self._sync(index)
+                self._index_pos = index.tell()
+            for entry in entries:
+                self._add_entry(entry)
+
+    def clear(self):
+        with self._lock, self._file_lock(exclusive=True) as data:
+            data.truncate(0)
+            self._sync(data)
+            with open(self.index_path, "wb") as index:
+                self._sync(index)
+            self._reset_index()
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def read(self, lot_id=None, product=None, buyer=None, since=None):
+        """
+        Enregistrements dans l'ordre d'ajout, filtrés par égalité sur
+        lot_id / product / buyer et par timestamp >= since.
+        """
+        with self._lock:
+            self._refresh()
+            entries = self._select(lot_id=lot_id, product=product, buyer=buyer)
+        if since is not None:
+            entries = [e for e in entries if e[_TIMESTAMP] >= since]
+        if not entries:
+            return []
+
+        return self._read_entries(entries)
+
+    def tail(self, start):
+        """Enregistrements à partir du start-ième (dans l'ordre d'ajout)"""
+        with self._lock:
+            self._refresh()
+            entries = self._entries[start:]
+        return self._read_entries(entries)
+
+    def column(self, field, lot_id=None, product=None, buyer=None):
+        """Valeurs d'un champ indexé (ou timestamp) des enregistrements, sans lire le journal"""
+        position = _TIMESTAMP if field == "timestamp" else INDEXED_FIELDS.index(field) + 2
+        with self._lock:
+            self._refresh()
+            return [e[position] for e in self._select(lot_id=lot_id, product=product, buyer=buyer)]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def _read_entries(self, entries):
+        if not entries:
+            return []
+        records = []
+        with open(self.path, "rb") as data:
+            for offset, length, *_ in entries:
+                data.seek(offset)
+                records.append(json.loads(data.read(length)))
+        return records
+
+    # -----------------------------
+    # Index
+    # -----------------------------
+    @staticmethod
+    def _entry(offset, length, record):
+        return [offset, length] + [record.get(f) for f in INDEXED_FIELDS] + [record.get("timestamp")]
+
+    def _reset_index(self):
+        self._entries = []
+        self._by = {field: {} for field in INDEXED_FIELDS}
+        self._index_pos = 0
+        self._data_end = 0
+
+    def _add_entry(self, entry):
+        position = len(self._entries)
+        self._entries.append(entry)
+        for i, field in enumerate(INDEXED_FIELDS, start=2):
+            self._by[field].setdefault(entry[i], []).append(position)
+        self._data_end = entry[0] + entry[1]
+
+    def _select(self, **filters):
+        filters = {f: v for f, v in filters.items() if v is not None}
+        if not filters:
+            return list(self._entries)
+
+        # On part de la liste la plus courte, les autres critères sont testés sur l'entrée
+        field = min(filters, key=lambda f: len(self._by[f].get(filters[f], ())))
+        columns = [(INDEXED_FIELDS.index(f) + 2, v) for f, v in filters.items() if f != field]
+        return [
+            self._entries[p] for p in self._by[field].get(filters[field], ())
+            if all(self._entries[p][i] == v for i, v in columns)
+        ]
+
+    def _refresh(self):
+        """Intègre les entrées d'index écrites depuis la dernière lecture"""
+        if not self.path.exists():
+            self._reset_index()
+            return
+        with self._file_lock(exclusive=False):
+            stale = self._refresh_locked(repair=False)
+        if stale:
+            with self._file_lock(exclusive=True):
+                self._refresh_locked(repair=True)
+
+    def _refresh_locked(self, repair):
+        """Renvoie True si le journal contient des lignes absentes de l'index"""
+        data_size = self.path.stat().st_size
+        index_size = self.index_path.stat().st_size if self.index_path.exists() else 0
+        if index_size < self._index_pos or data_size < self._data_end:
+            # Fichiers vidés ou remplacés entre-temps
+            self._reset_index()
+
+        if index_size > self._index_pos:
+            with open(self.index_path, "rb") as index:
+                index.seek(self._index_pos)
+                for line in index:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._add_entry(json.loads(line))
+                    self._index_pos += len(line)
+
+        if data_size <= self._data_end:
+            return False
+        if repair:
+            self._rebuild()
+        return True
+
+    def _rebuild(self):
+        """Reconstruit l'index depuis le journal (index absent, tronqué ou en retard)"""
+        self._reset_index()
+        with open(self.path, "r+b") as data:
+            offset = 0
+            for line in data:
+                if not line.endswith(b"\n"):
+                    break
+                self._add_entry(self._entry(offset, len(line), json.loads(line)))
+                offset += len(line)
+            # Dernière ligne incomplète : écriture interrompue, jamais indexée
+            data.truncate(offset)
+
+        with open(self.index_path, "wb") as index:
+            index.write(b"".join(json.dumps(e).encode() + b"\n" for e in self._entries))
+            self._sync(index)
+            self._index_pos = index.tell()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        with open(self.path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+
+BID_HISTORY = BidHistoryLog(DATA_PATH / "bids_history.jsonl")
+
+
+def import_legacy_history():
+    """Importe une fois l'ancien bids_history.json dans le journal"""
+    if BID_HISTORY.path.exists() or not (DATA_PATH / "bids_history.json").exists():
+        return
+    BID_HISTORY.append(read_json_file("bids_history.json"))
+    BID_HISTORY.path.touch()
+
+
+# -----------------------------
+# Accès à l'historique (journal ou SQLite selon STATE_BACKEND)
+# -----------------------------
+def append_bid_history(records):
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import append_history
+        return append_history(records)
+    import_legacy_history()
+    BID_HISTORY.append(records)
+
+
+def load_bid_history(lot_id=None, product=None, buyer=None, since=None):
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import load_history
+        return load_history(lot_id=lot_id, product=product, buyer=buyer, since=since)
+    import_legacy_history()
+    return BID_HISTORY.read(lot_id=lot_id, product=product, buyer=buyer, since=since)
+
+
+def load_bid_history_tail(start):
+    """Enregistrements ajoutés après les start premiers (lecture incrémentale)"""
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import load_history_tail
+        return load_history_tail(start)
+    import_legacy_history()
+    return BID_HISTORY.tail(start)
+
+
+def bid_history_size():
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import history_size
+        return history_size()
+    import_legacy_history()
+    return len(BID_HISTORY)
+
+
+def clear_bid_history():
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import clear_history
+        return clear_history()
+    BID_HISTORY.clear()
+
+
+def latest_round(lot_id, product):
+    """Enregistrements du dernier tour (timestamp le plus récent) d'un produit"""
+    if STATE_BACKEND == "sqlite":
+        from services import sqlite_store
+        return sqlite_store.latest_round(lot_id, product)
+    import_legacy_history()
+    timestamps = BID_HISTORY.column("timestamp", lot_id=lot_id, product=product)
+    if not timestamps:
+        return []
+    latest = max(timestamps)
+    return [h for h in BID_HISTORY.read(lot_id=lot_id, product=product, since=latest) if h["timestamp"] == latest]
+
+
+def buyer_lots(buyer):
+    """Lots sur lesquels l'acheteur a enchéri, dans l'ordre de première enchère"""
+    if STATE_BACKEND == "sqlite":
+        from services import sqlite_store
+        return sqlite_store.buyer_lots(buyer)
+    import_legacy_history()
+    return list(dict.fromkeys(BID_HISTORY.column("lot_id", buyer=buyer)))
+
+
+def revenue_by_round(lot_id):
+    """[(timestamp, chiffre d'affaires)] du lot, par ordre chronologique"""
+    if STATE_BACKEND == "sqlite":
+        from services import sqlite_store
+        return sqlite_store.revenue_by_round(lot_id)
+    revenue = {}
+    for h in load_bid_history(lot_id=lot_id):
+        revenue[h["timestamp"]] = revenue.get(h["timestamp"], 0) + h["final_price"] * h["qty_allocated"]
+    return sorted(revenue.items())
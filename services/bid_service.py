@@ -1,8 +1,11 @@
 from datetime import datetime
-from services.state_manager import load_json, save_json
+from services.bid_aggregates import clear_aggregates, update_aggregates
+from services.bid_history import append_bid_history, clear_bid_history
+from services.buyer_index import BUYER_INDEX
+from services.price_curves import PRICE_CURVES
 
 def save_final_allocations(buyers, allocations, lot_id, seller_id):
-    history = load_json("bids_history.json")
+    records = []
     now = datetime.utcnow().isoformat()
 
     for buyer in buyers:
@@ -10,7 +13,7 @@ def save_final_allocations(buyers, allocations, lot_id, seller_id):
         buyer_alloc = allocations.get(buyer_name, {})
 
         for pid, prod in buyer["products"].items():
-            history.append({
+            records.append({
                 "buyer": buyer_name,
                 "lot_id" : lot_id,
                 "seller_id": seller_id,
@@ -22,14 +25,109 @@ def save_final_allocations(buyers, allocations, lot_id, seller_id):
                 "timestamp": now
             })
 
-    save_json("bids_history.json", history)
+    # Ajout en fin de journal, sans relire ni réécrire l'historique
+    append_bid_history(records)
+    update_aggregates(records)
+    BUYER_INDEX.refresh()
+    PRICE_CURVES.invalidate(lot_id)
 
 
 #### Vider l'historique des enchères 
-from services.state_manager import save_json
-
 def reset_bid_history():
     """
-    Vide complètement le fichier bid_history.json
+    Vide complètement l'historique des enchères (journal, index, agrégats et courbes de prix)
+    """
+    clear_bid_history()
+    clear_aggregates()
+    BUYER_INDEX.reset()
+    PRICE_CURVES.invalidate()
+
+
+#### Calculs lancés depuis l'espace acheteur (exécutés en tâche de fond, voir services/jobs.py)
+SIMULATION_BUYER = "__SIMULATION__"
+
+def buyers_for_lot(buyers, lot_products):
+    """Acheteurs restreints aux produits du lot (ceux sans produit du lot sont ignorés)"""
+    lot_buyers = []
+    for b in buyers:
+        filtered_products = {
+            pid: p for pid, p in b["products"].items()
+            if pid in lot_products
+        }
+        if filtered_products:
+            lot_buyers.append({
+                "name": b["name"],
+                "auto_bid": b.get("auto_bid", False),
+                "products": filtered_products
+            })
+    return lot_buyers
+
+def simulate_bid(buyers, lot_products, draft_products, deadline_s=None):
+    """
+    Simule l'enchère draft_products face aux acheteurs du lot : allocation
+    après auto-bid, prix courants simulés et prix recommandés pour 100 %.
+    deadline_s : délai total en secondes (core/budget.py), partagé entre
+    l'auto-bid et la recommandation ; "solve_status" dit alors si le
+    résultat est optimal ou "best_effort" (None sans délai).
     """
-    save_json("bids_history.json", [])
+    from core.auto_bid import run_auto_bid
+    from core.budget import SolveBudget, combine_reports
+    from core.recommendation import simulate_optimal_bid
+    from core.solve_cache import cached_solve_model
+
+    products = list(lot_products.values())
+    # Les moteurs travaillent sur un calque (core/market_overlay.py) : ni le
+    # carnet ni le brouillon ne sont copiés ou modifiés
+    lot_buyers = buyers_for_lot(buyers, lot_products)
+    # Moitié du délai pour l'auto-bid, le reste (au moins l'autre moitié) pour la recommandation
+    first = SolveBudget(deadline_s / 2) if deadline_s else None
+
+    buyers_simulated = run_auto_bid(
+        lot_buyers + [{
+            "name": SIMULATION_BUYER,
+            "auto_bid": True,
+            "products": draft_products
+        }],
+        products,
+        budget=first
+    )
+    allocations, _ = cached_solve_model(buyers_simulated, products, budget=first)
+    first_report = first.report() if deadline_s else None
+    second = SolveBudget(max(deadline_s / 2, deadline_s - first_report["elapsed_s"])) if deadline_s else None
+
+    # simulate_optimal_bid ajoute lui-même l'acheteur simulé (sans prix max)
+    recommendations = simulate_optimal_bid(
+        lot_buyers,
+        products,
+        user_qtys={pid: prod["qty_desired"] for pid, prod in draft_products.items()},
+        user_prices={pid: prod["current_price"] for pid, prod in draft_products.items()},
+        new_buyer_name=SIMULATION_BUYER,
+        budget=second
+    )
+
+    return {
+        "allocations": allocations[SIMULATION_BUYER],
+        "prices": {pid: p["current_price"] for pid, p in buyers_simulated[-1]["products"].items()},
+        "recommendations": recommendations,
+        "solve_status": combine_reports([first_report, second.report()], deadline_s) if deadline_s else None,
+    }
+
+def clear_lot(buyers, lot_products, seller_global_moq=80):
+    """
+    Auto-bid puis allocation du lot, renvoie (acheteurs aux prix finaux, allocations).
+    Un lot fait de plusieurs sous-marchés indépendants (aucun acheteur commun)
+    est traité composante par composante (core/decomposition.py).
+    """
+    from core.auto_bid import run_auto_bid
+    from core.decomposition import auto_bid_decomposed, solve_decomposed, split_components
+    from core.solve_cache import cached_solve_model
+
+    products = list(lot_products.values())
+    lot_buyers = buyers_for_lot(buyers, lot_products)
+    if len(split_components(lot_buyers, products)) > 1:
+        cleared = auto_bid_decomposed(lot_buyers, products, seller_global_moq)
+        allocations, _ = solve_decomposed(cleared, products, seller_global_moq)
+    else:
+        cleared = run_auto_bid(lot_buyers, products, seller_global_moq=seller_global_moq)
+        allocations, _ = cached_solve_model(cleared, products, seller_global_moq)
+    return cleared, allocations
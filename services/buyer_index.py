@@ -0,0 +1,54 @@
+import threading
+from services.bid_history import bid_history_size, load_bid_history_tail
+
+# -----------------------------
+# Index de l'historique par acheteur
+# -----------------------------
+# Dernier enregistrement par (acheteur, lot, produit), gardé en mémoire et
+# complété en ne lisant que les enregistrements ajoutés depuis la dernière
+# mise à jour. Un tableau de bord acheteur coûte alors O(lots × produits de
+# l'acheteur) au lieu d'un parcours de tout l'historique.
+
+
+class BuyerIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._latest = {}
+            self._size = 0
+
+    def refresh(self):
+        """Intègre les enregistrements ajoutés à l'historique (par ce processus ou un autre)"""
+        with self._lock:
+            size = bid_history_size()
+            if size < self._size:
+                # Historique vidé ou remplacé
+                self.reset()
+            if size > self._size:
+                records = load_bid_history_tail(self._size)
+                for record in records:
+                    self._add(record)
+                self._size += len(records)
+
+    def _add(self, record):
+        lot = self._latest.setdefault(record["buyer"], {}).setdefault(record["lot_id"], {})
+        current = lot.get(record["product"])
+        if current is None or record["timestamp"] >= current["timestamp"]:
+            lot[record["product"]] = record
+
+    def lots(self, buyer):
+        """Lots sur lesquels l'acheteur a enchéri, dans l'ordre de première enchère"""
+        self.refresh()
+        return list(self._latest.get(buyer, {}))
+
+    def latest(self, buyer, lot_id):
+        """{produit: dernier enregistrement} de l'acheteur sur le lot"""
+        self.refresh()
+        return dict(self._latest.get(buyer, {}).get(lot_id, {}))
+
+
+BUYER_INDEX = BuyerIndex()
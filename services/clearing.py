@@ -0,0 +1,180 @@
+import copy
+import threading
+from services.bid_aggregates import lot_book
+from services.bid_service import clear_lot, save_final_allocations
+from services.jobs import JOB_RUNNER
+from services.state_manager import load_json
+
+# -----------------------------
+# Clôture des lots par tours regroupés
+# -----------------------------
+# Les enchères placées sur un lot sont mises en file ; un seul tour de
+# clôture (auto-bid + allocation + une écriture d'historique) tourne à la
+# fois par lot et il prend toutes les enchères arrivées pendant le tour
+# précédent. Le travail du solveur suit donc le rythme des clôtures, pas
+# celui des clics.
+#
+# Le carnet d'un lot (dernière enchère de chaque acheteur, aux prix issus de
+# la dernière clôture) est partagé par toutes les sessions ; au premier accès
+# il est repris du dernier tour enregistré dans l'historique (lot_book).
+# close_lot demande un tour sans nouvelle enchère (clôture admin) : il passe
+# par la même file et le même verrou que les tours des sessions.
+# Si un tour échoue, ses enchères sont gardées dans le carnet.
+
+# Tours terminés gardés par lot pour que les sessions récupèrent leur résultat
+MAX_KEPT_ROUNDS = 64
+
+
+class LotClearingScheduler:
+
+    def __init__(self, runner=None):
+        self.runner = runner or JOB_RUNNER
+        self._lots = {}
+        self._lock = threading.Lock()
+
+    def _lot(self, lot_id):
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            if lot is None:
+                lot = {
+                    "lock": threading.Lock(),
+                    "book": lot_book(lot_id),
+                    "pending": {},
+                    "forced": False,
+                    "next_round": 1,
+                    "results": {},
+                    "worker": None,
+                    "job_id": None,
+                }
+                self._lots[lot_id] = lot
+            return lot
+
+    # -----------------------------
+    # Sessions
+    # -----------------------------
+    def submit_bid(self, lot_id, buyer):
+        """
+        Met en file l'enchère buyer ({"name", "auto_bid", "products"}) et
+        renvoie le numéro du tour de clôture qui la prendra en compte.
+        Une nouvelle enchère du même acheteur avant ce tour remplace la précédente.
+        """
+        lot = self._lot(lot_id)
+        with lot["lock"]:
+            lot["pending"][buyer["name"]] = copy.deepcopy(buyer)
+            ticket = lot["next_round"]
+            self._start_worker(lot_id, lot)
+        return ticket
+
+    def close_lot(self, lot_id):
+        """
+        Demande un tour de clôture du lot sur son carnet courant (repris de
+        l'historique si le lot n'a pas encore été chargé), même sans nouvelle
+        enchère ; renvoie le numéro du tour, à suivre avec outcome().
+        """
+        lot = self._lot(lot_id)
+        with lot["lock"]:
+            lot["forced"] = True
+            ticket = lot["next_round"]
+            self._start_worker(lot_id, lot)
+        return ticket
+
+    def outcome(self, lot_id, ticket):
+        """Résultat du tour ticket ({"round", "bids", "buyers", "allocations", "error"}), None s'il n'est pas terminé"""
+        lot = self._lot(lot_id)
+        with lot["lock"]:
+            return lot["results"].get(ticket)
+
+    def status(self, lot_id):
+        """{"pending": enchères en file, "round": tour en cours, "job": état de la tâche de calcul}"""
+        lot = self._lot(lot_id)
+        with lot["lock"]:
+            job_id = lot["job_id"]
+            status = {"pending": len(lot["pending"]), "round": lot["next_round"] - 1 if job_id else None}
+        # None si la tâche est terminée entre-temps
+        status["job"] = self.runner.status(job_id) if job_id else None
+        return status
+
+    def book(self, lot_id):
+        """Acheteurs du lot aux prix de la dernière clôture"""
+        lot = self._lot(lot_id)
+        with lot["lock"]:
+            return copy.deepcopy(list(lot["book"].values()))
+
+    def buyers(self):
+        """Acheteurs de tous les lots chargés, produits fusionnés par acheteur"""
+        merged = {}
+        for lot_id in list(self._lots):
+            for buyer in self.book(lot_id):
+                entry = merged.setdefault(buyer["name"], {"name": buyer["name"], "auto_bid": False, "products": {}})
+                entry["auto_bid"] = entry["auto_bid"] or buyer.get("auto_bid", False)
+                entry["products"].update(buyer["products"])
+        return list(merged.values())
+
+    # -----------------------------
+    # Tours de clôture
+    # -----------------------------
+    def _start_worker(self, lot_id, lot):
+        # Appelé sous le verrou du lot
+        if lot["worker"] is None:
+            lot["worker"] = threading.Thread(target=self._clear_loop, args=(lot_id,), daemon=True)
+            lot["worker"].start()
+
+    def _clear_loop(self, lot_id):
+        lot = self._lot(lot_id)
+        while True:
+            with lot["lock"]:
+                if not lot["pending"] and not lot["forced"]:
+                    lot["worker"] = None
+                    return
+                bids = lot["pending"]
+                lot["pending"] = {}
+                lot["forced"] = False
+                round_number = lot["next_round"]
+                lot["next_round"] += 1
+                book = dict(lot["book"])
+                book.update(bids)
+
+            result = self._clear_round(lot_id, round_number, book, len(bids))
+
+            with lot["lock"]:
+                if result["error"] is None:
+                    lot["book"] = {b["name"]: b for b in result["buyers"]}
+                else:
+                    # Tour en échec : les enchères du tour restent au carnet,
+                    # aux prix soumis, et seront reprises au tour suivant
+                    lot["book"].update(bids)
+                lot["job_id"] = None
+                lot["results"][round_number] = result
+                for old in [r for r in lot["results"] if r <= round_number - MAX_KEPT_ROUNDS]:
+                    del lot["results"][old]
+
+    def _clear_round(self, lot_id, round_number, book, nb_bids):
+        result = {"round": round_number, "bids": nb_bids, "buyers": [], "allocations": {}, "error": None}
+        if not book:
+            # Aucun acheteur : rien à clôturer ni à enregistrer
+            return result
+        try:
+            products = load_json("products.json")
+            lot_products = {pid: p for pid, p in products.items() if p["lot_id"] == lot_id}
+            lot_conf = load_json("lots.json")[lot_id]
+            job_id = self.runner.submit(
+                clear_lot, list(book.values()), lot_products, lot_conf.get("global_moq", 80),
+                name=f"clearing {lot_id}"
+            )
+            with self._lot(lot_id)["lock"]:
+                self._lot(lot_id)["job_id"] = job_id
+            try:
+                cleared, allocations = self.runner.result(job_id)
+            finally:
+                self.runner.forget(job_id)
+
+            save_final_allocations(cleared, allocations, lot_id, lot_conf.get("seller_id"))
+            result["buyers"] = cleared
+            result["allocations"] = allocations
+        except Exception as exc:
+            result["error"] = repr(exc)
+        return result
+
+
+# Planificateur partagé par toutes les sessions du processus Streamlit
+CLEARING_SCHEDULER = LotClearingScheduler()
@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from core import instrumentation
+
+# -----------------------------
+# Exécution des calculs d'enchère en tâche de fond
+# -----------------------------
+# Les simulations et clôtures (auto-bid, résolutions CBC) tournent dans un
+# pool de processus borné : la page Streamlit soumet la tâche, reçoit un
+# identifiant, puis relit son état à chaque rerun.
+# La progression (tours d'auto-bid, résolutions) remonte par
+# l'instrumentation de core/ ; l'annulation d'une tâche en cours est
+# vérifiée à chacun de ces événements ; ce sink ne demande pas le détail des
+# résolutions (instrumentation.detailed()).
+# Si ALLOCATION_SOLVE_CACHE est défini, les processus de calcul partagent le
+# niveau disque du cache de résolutions : une tâche profite des résolutions
+# déjà faites par les autres processus.
+
+# Nombre de processus de calcul (JOB_WORKERS)
+DEFAULT_WORKERS = int(os.environ.get("JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+# Délai minimal entre deux remontées de progression d'un processus
+PROGRESS_INTERVAL_S = 0.2
+
+# Tâches terminées gardées pour consultation
+MAX_FINISHED_JOBS = 256
+
+JOB_STATES = ("pending", "running", "done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# -----------------------------
+# Côté processus de calcul
+# -----------------------------
+_progress = None
+_cancelled = None
+
+
+def _init_worker(progress, cancelled):
+    global _progress, _cancelled
+    from core.solve_cache import SOLVE_CACHE
+
+    _progress = progress
+    _cancelled = cancelled
+    SOLVE_CACHE.reopen()
+
+
+class _ProgressReporter:
+    """Sink d'instrumentation : compte tours et résolutions, lève JobCancelled si demandé"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.rounds = 0
+        self.solves = 0
+        self._last_report = 0.0
+
+    def __call__(self, record):
+        if record["event"] == "solve":
+            self.solves += 1
+        elif record["event"] == "auto_bid_round":
+            self.rounds += 1
+        else:
+            return
+
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL_S and record["event"] == "solve":
+            return
+        self._last_report = now
+        self.report()
+        if self.job_id in _cancelled:
+            raise JobCancelled(self.job_id)
+
+    def report(self):
+        _progress[self.job_id] = {"rounds": self.rounds, "solves": self.solves}
+
+
+def _run_job(job_id, fn, args, kwargs):
+    if job_id in _cancelled:
+        raise JobCancelled(job_id)
+    reporter = _ProgressReporter(job_id)
+    instrumentation.add_sink(reporter, detailed=False)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        instrumentation.remove_sink(reporter)
+        reporter.report()
+
+
+# -----------------------------
+# Côté application
+# -----------------------------
+class JobRunner:
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._manager = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._manager = multiprocessing.Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._pool = ProcessPoolExecutor(
+                self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._progress, self._cancelled),
+            )
+        return self._pool
+
+    def submit(self, fn, *args, name=None, **kwargs):
+        """Planifie fn(*args, **kwargs) (fonction de module, arguments picklables), renvoie l'id"""
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            future = self._ensure_pool().submit(_run_job, job_id, fn, args, kwargs)
+            self._jobs[job_id] = {
+                "future": future,
+                "name": name or getattr(fn, "__name__", "job"),
+                "submitted": time.time(),
+            }
+            self._prune()
+        return job_id
+
+    def status(self, job_id):
+        """
+        {"id", "name", "state", "progress": {"rounds", "solves"}, "error"},
+        None si la tâche est inconnue (oubliée ou retirée après MAX_FINISHED_JOBS).
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        error = None
+        if future.cancelled():
+            state = "cancelled"
+        elif future.done():
+            exc = future.exception()
+            if exc is None:
+                state = "done"
+            elif isinstance(exc, JobCancelled):
+                state = "cancelled"
+            else:
+                state, error = "failed", repr(exc)
+        else:
+            state = "running" if future.running() else "pending"
+        return {
+            "id": job_id,
+            "name": job["name"],
+            "state": state,
+            "progress": dict(self._progress.get(job_id, {"rounds": 0, "solves": 0})),
+            "error": error,
+        }
+
+    def result(self, job_id, timeout=None):
+        """Résultat de la tâche (attend au plus timeout secondes) ; lève JobCancelled si annulée"""
+        try:
+            return self._jobs[job_id]["future"].result(timeout)
+        except CancelledError:
+            raise JobCancelled(job_id)
+
+    def cancel(self, job_id):
+        """Annule une tâche en attente, ou l'interrompt à son prochain événement si elle tourne"""
+        future = self._jobs[job_id]["future"]
+        if future.cancel():
+            return True
+        if not future.done():
+            self._cancelled[job_id] = True
+        return False
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["future"].done()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._jobs.pop(job_id)
+            self._progress.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+
+
+# Pool partagé par toutes les sessions du processus Streamlit
+JOB_RUNNER = JobRunner()
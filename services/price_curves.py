@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from core.price_estimate import price_quantity_curves
+from services.bid_aggregates import lot_book
+from services.bid_history import bid_history_size
+from services.state_manager import load_json
+
+# -----------------------------
+# Courbes prix -> quantité par lot
+# -----------------------------
+# Les courbes de tous les produits d'un lot sont calculées en un passage sur
+# le carnet (dernier tour enregistré) et gardées en mémoire, par lot,
+# version du carnet et acheteur exclu (on se compare aux autres). La version
+# est la taille de l'historique : chaque clôture l'augmente, et
+# save_final_allocations retire en plus les courbes du lot enregistré.
+# Toute question "quel prix pour q" / "quelle quantité à p" devient une
+# lecture de la courbe (core.price_estimate.curve_price / curve_qty), avec
+# une réponse indicative : les courbes ignorent les MOQ.
+
+MAX_CACHED_CURVES = 256
+
+
+class PriceCurveCache:
+
+    def __init__(self, maxsize=MAX_CACHED_CURVES):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def curves(self, lot_id, exclude_buyer=None):
+        """{produit: [{"price", "qty"}]} du lot face au carnet courant, sans l'enchère de exclude_buyer"""
+        key = (lot_id, bid_history_size(), exclude_buyer)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        lot_products = [p for p in load_json("products.json").values() if p["lot_id"] == lot_id]
+        curves = price_quantity_curves(lot_book(lot_id).values(), lot_products, exclude_buyer)
+
+        with self._lock:
+            self._entries[key] = curves
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return curves
+
+    def invalidate(self, lot_id=None):
+        """Oublie les courbes d'un lot (ou de tous les lots)"""
+        with self._lock:
+            for key in [k for k in self._entries if lot_id is None or k[0] == lot_id]:
+                del self._entries[key]
+
+
+PRICE_CURVES = PriceCurveCache()
@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import threading
+from services.state_manager import DATA_PATH
+
+# -----------------------------
+# Stockage SQLite local (STATE_BACKEND=sqlite)
+# -----------------------------
+# Un seul fichier data/state.sqlite, sans serveur. Les documents JSON
+# historiques (products.json, lots.json, buyers.json, bids_history.json)
+# sont répartis en tables ; les colonnes interrogées sont extraites et
+# indexées, le reste de chaque objet est conservé tel quel dans "data".
+
+DB_PATH = DATA_PATH / "state.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    lot_id TEXT PRIMARY KEY,
+    seller_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    lot_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buyers (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bids (
+    product TEXT NOT NULL,
+    buyer TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (product, buyer)
+);
+CREATE TABLE IF NOT EXISTS allocation_history (
+    id INTEGER PRIMARY KEY,
+    buyer TEXT,
+    lot_id TEXT,
+    seller_id TEXT,
+    product TEXT,
+    qty_desired INTEGER,
+    qty_allocated INTEGER,
+    final_price REAL,
+    max_price REAL,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lots_seller ON lots (seller_id);
+CREATE INDEX IF NOT EXISTS idx_products_lot ON products (lot_id);
+CREATE INDEX IF NOT EXISTS idx_history_lot_product_ts ON allocation_history (lot_id, product, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_buyer_lot ON allocation_history (buyer, lot_id);
+"""
+
+HISTORY_COLUMNS = (
+    "buyer", "lot_id", "seller_id", "product", "qty_desired",
+    "qty_allocated", "final_price", "max_price", "timestamp",
+)
+
+_db = None
+_lock = threading.Lock()
+
+
+def connect():
+    """Connexion partagée par le processus (créée et migrée au premier appel)"""
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _db.row_factory = sqlite3.Row
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.executescript(SCHEMA)
+        _db.commit()
+    return _db
+
+
+def data_version():
+    """Change à chaque écriture, de ce processus ou d'un autre"""
+    with _lock:
+        db = connect()
+        return db.execute("PRAGMA data_version").fetchone()[0], db.total_changes
+
+
+def _rows(sql, params=()):
+    with _lock:
+        return connect().execute(sql, params).fetchall()
+
+
+# -----------------------------
+# Documents (équivalents de load_json / save_json)
+# -----------------------------
+def load_document(filename):
+    if filename == "products.json":
+        return _load_products()
+    if filename == "lots.json":
+        return {r["lot_id"]: json.loads(r["data"]) for r in _rows("SELECT lot_id, data FROM lots ORDER BY rowid")}
+    if filename == "buyers.json":
+        return {r["id"]: json.loads(r["data"]) for r in _rows("SELECT id, data FROM buyers ORDER BY rowid")}
+    if filename == "bids_history.json":
+        return load_history()
+
+    rows = _rows("SELECT data FROM documents WHERE name = ?", (filename,))
+    if not rows:
+        raise FileNotFoundError(filename)
+    return json.loads(rows[0]["data"])
+
+
+def save_document(filename, data):
+    with _lock:
+        db = connect()
+        with db:
+            if filename == "products.json":
+                _save_products(db, data)
+            elif filename == "lots.json":
+                db.execute("DELETE FROM lots")
+                db.executemany(
+                    "INSERT INTO lots (lot_id, seller_id, data) VALUES (?, ?, ?)",
+                    [(lot_id, lot.get("seller_id"), json.dumps(lot)) for lot_id, lot in data.items()],
+                )
+            elif filename == "buyers.json":
+                db.execute("DELETE FROM buyers")
+                db.executemany(
+                    "INSERT INTO buyers (id, data) VALUES (?, ?)",
+                    [(buyer_id, json.dumps(buyer)) for buyer_id, buyer in data.items()],
+                )
+            elif filename == "bids_history.json":
+                db.execute("DELETE FROM allocation_history")
+                _insert_history(db, data)
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO documents (name, data) VALUES (?, ?)",
+                    (filename, json.dumps(data)),
+                )
+
+
+def _load_products():
+    products = {}
+    for r in _rows("SELECT id, data FROM products ORDER BY rowid"):
+        products[r["id"]] = json.loads(r["data"])
+    for r in _rows("SELECT product, buyer, data FROM bids ORDER BY rowid"):
+        product = products.get(r["product"])
+        if product is not None and "bids" in product:
+            product["bids"][r["buyer"]] = json.loads(r["data"])
+    return products
+
+
+def _save_products(db, products):
+    # Les enchères courantes (product["bids"]) ont leur propre table ;
+    # la clé "bids" est gardée vide dans data pour être reconstituée au chargement.
+    db.execute("DELETE FROM products")
+    db.execute("DELETE FROM bids")
+    product_rows = []
+    bid_rows = []
+    for pid, product in products.items():
+        stored = dict(product)
+        if "bids" in stored:
+            for buyer, bid in stored["bids"].items():
+                bid_rows.append((pid, buyer, json.dumps(bid)))
+            stored["bids"] = {}
+        product_rows.append((pid, product.get("lot_id"), json.dumps(stored)))
+    db.executemany("INSERT INTO products (id, lot_id, data) VALUES (?, ?, ?)", product_rows)
+    db.executemany("INSERT INTO bids (product, buyer, data) VALUES (?, ?, ?)", bid_rows)
+
+
+# -----------------------------
+# Historique des allocations
+# -----------------------------
+def _insert_history(db, records):
+    db.executemany(
+        f"INSERT INTO allocation_history ({', '.join(HISTORY_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in HISTORY_COLUMNS)})",
+        [tuple(r.get(c) for c in HISTORY_COLUMNS) for r in records],
+    )
+
+
+def append_history(records):
+    with _lock:
+        db = connect()
+        with db:
+            _insert_history(db, records)
+
+
+def clear_history():
+    with _lock:
+        db = connect()
+        with db:
+            db.execute("DELETE FROM allocation_history")
+
+
+def history_size():
+    # id contigus (voir load_history_tail) : MAX(id) lu sur la clé primaire, sans parcours
+    return _rows("SELECT COALESCE(MAX(id), 0) FROM allocation_history")[0][0]
+
+
+def load_history_tail(start):
+    # Les id se suivent depuis 1 : l'historique n'est jamais supprimé que d'un bloc
+    rows = _rows(
+        f"SELECT {', '.join(HISTORY_COLUMNS)} FROM allocation_history WHERE id > ? ORDER BY id", (start,)
+    )
+    return [dict(r) for r in rows]
+
+
+def load_history(lot_id=None, product=None, buyer=None, since=None):
+    """Enregistrements dans l'ordre d'ajout, mêmes filtres que bid_history.load_bid_history"""
+    clauses = []
+    params = []
+    for column, value in (("lot_id", lot_id), ("product", product), ("buyer", buyer)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _rows(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM allocation_history {where} ORDER BY id", params)
+    return [dict(r) for r in rows]
+
+
+# -----------------------------
+# Requêtes des tableaux de bord
+# -----------------------------
+def latest_round(lot_id, product):
+    """Enregistrements du dernier tour (timestamp le plus récent) d'un produit"""
+    rows = _rows(
+        f"SELECT {', '.join(HISTORY_COLUMNS)} FROM allocation_history "
+        "WHERE lot_id = ? AND product = ? AND timestamp = ("
+        "  SELECT MAX(timestamp) FROM allocation_history WHERE lot_id = ? AND product = ?"
+        ") ORDER BY id",
+        (lot_id, product, lot_id, product),
+    )
+    return [dict(r) for r in rows]
+
+
+def buyer_lots(buyer):
+    """Lots sur lesquels l'acheteur a enchéri, dans l'ordre de première enchère"""
+    rows = _rows(
+        "SELECT lot_id FROM allocation_history WHERE buyer = ? GROUP BY lot_id ORDER BY MIN(id)",
+        (buyer,),
+    )
+    return [r["lot_id"] for r in rows]
+
+
+def revenue_by_round(lot_id):
+    """[(timestamp, chiffre d'affaires)] du lot, par ordre chronologique"""
+    rows = _rows(
+        "SELECT timestamp, SUM(final_price * qty_allocated) AS ca FROM allocation_history "
+        "WHERE lot_id = ? GROUP BY timestamp ORDER BY timestamp",
+        (lot_id,),
+    )
+    return [(r["timestamp"], r["ca"]) for r in rows]
+
+
+# -----------------------------
+# Migration depuis les fichiers JSON
+# -----------------------------
+def migrate_from_json():
+    """Copie les fichiers JSON de data/ et l'historique des enchères dans la base"""
+    from services.bid_history import BID_HISTORY, import_legacy_history
+    from services.state_manager import read_json_file
+
+    counts = {}
+    for path in sorted(DATA_PATH.glob("*.json")):
+        if path.name == "bids_history.json":
+            continue
+        data = read_json_file(path.name)
+        save_document(path.name, data)
+        counts[path.name] = len(data)
+
+    import_legacy_history()
+    history = BID_HISTORY.read()
+    save_document("bids_history.json", history)
+    counts["bids_history.json"] = len(history)
+    return counts
+
+
+if __name__ == "__main__":
+    for name, count in migrate_from_json().items():
+        print(f"{name:<20} {count:>8} enregistrements")
+    print(f"Base écrite dans {DB_PATH}")
@@ -1,12 +1,111 @@
+import copy
 import json
+import os
+import threading
 from pathlib import Path
 
 DATA_PATH = Path("data")
 
-def load_json(filename):
+# Stockage : "json" (fichiers de data/, défaut) ou "sqlite" (data/state.sqlite,
+# voir services/sqlite_store.py ; migration : python -m services.sqlite_store)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "json")
+BACKENDS = ("json", "sqlite")
+
+def read_json_file(filename):
     with open(DATA_PATH / filename) as f:
         return json.load(f)
 
-def save_json(filename, data):
+def write_json_file(filename, data):
     with open(DATA_PATH / filename, "w") as f:
         json.dump(data, f, indent=2)
+
+# -----------------------------
+# Cache de lecture partagé
+# -----------------------------
+# Les documents lus sont gardés au niveau du module (donc partagés par toutes
+# les sessions Streamlit du processus) et rendus sous forme d'instantanés en
+# lecture seule. Chaque entrée est associée à une version : (mtime, taille)
+# du fichier en JSON, compteur de changements de la base en SQLite, plus un
+# compteur d'écritures locales. save_json l'invalide immédiatement ; une
+# écriture d'un autre processus est vue au prochain changement de version.
+
+class FrozenDict(dict):
+    """dict en lecture seule ; copy.deepcopy (ou thaw) rend une copie modifiable"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Instantané en lecture seule : utiliser thaw() avant de le modifier")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+def freeze(data):
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(value) for value in data)
+    return data
+
+def thaw(data):
+    """Copie modifiable (dicts et listes) d'un instantané"""
+    if isinstance(data, dict):
+        return {key: thaw(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [thaw(value) for value in data]
+    return data
+
+_cache = {}
+_writes = {}
+_cache_lock = threading.Lock()
+
+def _version(filename):
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import data_version
+        source = data_version()
+    else:
+        stat = os.stat(DATA_PATH / filename)
+        source = (stat.st_mtime_ns, stat.st_size)
+    return source, _writes.get(filename, 0)
+
+def invalidate(filename=None):
+    with _cache_lock:
+        if filename is None:
+            _cache.clear()
+        else:
+            _cache.pop(filename, None)
+            _writes[filename] = _writes.get(filename, 0) + 1
+
+def load_json(filename):
+    """Instantané en lecture seule du document (voir thaw pour le modifier)"""
+    version = _version(filename)
+    with _cache_lock:
+        entry = _cache.get(filename)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_store import load_document
+        data = freeze(load_document(filename))
+    else:
+        data = freeze(read_json_file(filename))
+
+    with _cache_lock:
+        _cache[filename] = (version, data)
+    return data
+
+def save_json(filename, data):
+    try:
+        if STATE_BACKEND == "sqlite":
+            from services.sqlite_store import save_document
+            return save_document(filename, data)
+        write_json_file(filename, data)
+    finally:
+        invalidate(filename)
@@ -1,6 +1,8 @@
+import time
 import streamlit as st
 import pandas as pd 
-from services.state_manager import load_json, save_json
+from services.state_manager import load_json, save_json, thaw
+from services.bid_history import load_bid_history
 
 def admin_app():
     st.title("🛠️ Interface Admin")
@@ -10,11 +12,49 @@ def admin_app():
     # Bouton pour réinitialiser l'historique
     if st.button("⚠️ Réinitialiser l'historique des enchères"):
         reset_bid_history()
-        st.success("Le fichier bid_history.json a été remis à zéro ✅")
+        st.success("L'historique des enchères a été remis à zéro ✅")
 
     products = load_json("products.json")
     buyers = load_json("buyers.json")
-    bids_history = load_json("bids_history.json") 
+    bids_history = load_bid_history()
+    lots = load_json("lots.json")
+
+    # Clôture de tous les lots : un tour par lot via le planificateur (même
+    # file et même verrou que les enchères des sessions, carnet repris de
+    # l'historique pour les lots pas encore chargés), les lots en parallèle
+    if st.button("🏁 Clôturer tous les lots"):
+        from services.clearing import CLEARING_SCHEDULER
+
+        tickets = {lot_id: CLEARING_SCHEDULER.close_lot(lot_id) for lot_id in lots}
+        outcomes = {}
+        with st.spinner("Clôture des lots en cours…"):
+            while len(outcomes) < len(tickets):
+                for lot_id, ticket in tickets.items():
+                    if lot_id not in outcomes:
+                        outcome = CLEARING_SCHEDULER.outcome(lot_id, ticket)
+                        if outcome is not None:
+                            outcomes[lot_id] = outcome
+                if len(outcomes) < len(tickets):
+                    time.sleep(0.5)
+
+        rows = []
+        for lot_id, outcome in outcomes.items():
+            total_ca = 0.0
+            for buyer in outcome["buyers"]:
+                buyer_allocs = outcome["allocations"].get(buyer["name"], {})
+                for pid, prod_conf in buyer["products"].items():
+                    total_ca += buyer_allocs.get(pid, 0) * prod_conf["current_price"]
+            rows.append({
+                "Lot": lots[lot_id]["lot_name"],
+                "Acheteurs": len(outcome["buyers"]),
+                "Chiffre d'affaires (€)": round(total_ca, 2),
+                "Erreur": outcome["error"] or ""
+            })
+        st.dataframe(pd.DataFrame(rows))
+        if any(o["error"] for o in outcomes.values()):
+            st.error("Certains lots n'ont pas pu être clôturés")
+        else:
+            st.success("Tous les lots ont été clôturés ✅")
 
 
     st.subheader("👥 Acheteurs")
@@ -27,6 +67,7 @@ def admin_app():
     st.json(bids_history)
 
     if st.button("🧹 Reset toutes les enchères"):
+        products = thaw(products)
         for p in products.values():
             p["bids"] = {}
         save_json("products.json", products)
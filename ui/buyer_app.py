@@ -1,9 +1,22 @@
 import streamlit as st
 import copy
+import time
 import pandas as pd
 from services.state_manager import load_json
-from services.bid_service import save_final_allocations
-from core.allocation_algo import run_auto_bid_aggressive, solve_model
+from services.bid_history import bid_history_size, load_bid_history
+from services.buyer_index import BUYER_INDEX
+from core.price_estimate import curve_qty
+from core.recommendation import simulate_optimal_bid
+from services.bid_service import buyers_for_lot, simulate_bid
+from services.clearing import CLEARING_SCHEDULER
+from services.jobs import JOB_RUNNER
+from services.price_curves import PRICE_CURVES
+
+# Délai entre deux relectures de l'état d'une tâche de fond
+JOB_POLL_INTERVAL_S = 0.5
+
+# Délai de réponse de « Simuler » (core/budget.py) : au-delà, meilleur résultat trouvé
+SIMULATION_DEADLINE_S = 15.0
 
 
 def buyer_app():
@@ -22,15 +35,14 @@ def buyer_app():
     st.title("🛒 Dashboard Acheteur")
     st.subheader("📦 Suivi global de mes lots")
 
-    history = load_json("bids_history.json")
     lots = load_json("lots.json")
     products = load_json("products.json")
 
-    # Historique de l'acheteur
-    buyer_history = [h for h in history if h["buyer"] == buyer_id]
+    # Lots sur lesquels l'acheteur a au moins une enchère
+    lot_ids = BUYER_INDEX.lots(buyer_id)
 
     # --- Cas 1 : aucune enchère ---
-    if not buyer_history:
+    if not lot_ids:
         st.info(
             "Vous n’avez encore placé aucune enchère.\n\n"
             "👉 Sélectionnez un lot ci-dessous pour commencer à enchérir."
@@ -38,17 +50,14 @@ def buyer_app():
     else:
         rows = []
 
-        # Lots sur lesquels l'acheteur a au moins une enchère
-        buyer_lots = set(h["lot_id"] for h in buyer_history)
-
-        for lot_id in buyer_lots:
+        for lot_id in lot_ids:
             lot_name = lots.get(lot_id, {}).get("lot_name", lot_id)
 
-            lot_hist = [h for h in buyer_history if h["lot_id"] == lot_id]
+            lot_latest = BUYER_INDEX.latest(buyer_id, lot_id).values()
 
             # Dernière enchère du lot
-            latest_ts = max(h["timestamp"] for h in lot_hist)
-            last_round = [h for h in lot_hist if h["timestamp"] == latest_ts]
+            latest_ts = max(h["timestamp"] for h in lot_latest)
+            last_round = [h for h in lot_latest if h["timestamp"] == latest_ts]
 
             qty_desired = sum(h["qty_desired"] for h in last_round)
             qty_allocated = sum(h["qty_allocated"] for h in last_round)
@@ -80,7 +89,6 @@ def buyer_app():
 
         st.dataframe(df, use_container_width=True)
 
-    lots = load_json("lots.json")
     lot_options = [""] + list(lots.keys())
 
     lot_id = st.selectbox(
@@ -99,38 +107,26 @@ def buyer_app():
     if not seller_id:
         st.warning("Ce lot n'a pas de seller_id défini !")
 
-    # Session state
-    if "buyers" not in st.session_state:
-        st.session_state.buyers = []
-
-    # Charger les produits et historique d'enchère
-    products = load_json("products.json")
-    history = load_json("bids_history.json")
-
     # -----------------------------
     # Suivi de l'enchère acheteur
     # -----------------------------
-    buyer_history = [
-        h for h in history
-        if h["buyer"] == buyer_id and h["lot_id"] == lot_id
-    ]
+    # Dernier état de l'acheteur par produit du lot
+    buyer_latest = BUYER_INDEX.latest(buyer_id, lot_id)
 
     st.subheader("📊 Suivi de mon enchère")
 
     fully_allocated = False
 
-    if not buyer_history:
+    if not buyer_latest:
         st.info(
             "Vous n'avez encore placé aucune enchère.\n\n"
             "👉 Renseignez vos prix et quantités ci-dessous pour commencer."
         )
     else:
         df = (
-            pd.DataFrame(buyer_history)
+            pd.DataFrame(list(buyer_latest.values()))
             .assign(timestamp=lambda d: pd.to_datetime(d["timestamp"]))
-            .sort_values("timestamp")
-            .groupby("product", as_index=False)
-            .last()
+            .sort_values("product")
             .rename(columns={
                 "product": "Produit",
                 "qty_desired": "Qté demandée",
@@ -184,10 +180,8 @@ def buyer_app():
 
         for pid, p in lot_products.items():
             product_history = [
-                h for h in history
-                if h["product"] == pid
-                and h["qty_allocated"] > 0
-                and h["lot_id"] == lot_id
+                h for h in load_bid_history(lot_id=lot_id, product=pid)
+                if h["qty_allocated"] > 0
             ]
 
             if product_history:
@@ -203,17 +197,7 @@ def buyer_app():
                 current_prices[pid] = p["starting_price"]
 
         # --- Récupérer les dernières valeurs de l'acheteur ---
-        last_qty = {}
-        if buyer_history:
-            df_buyer = (
-                pd.DataFrame(buyer_history)
-                .assign(timestamp=lambda d: pd.to_datetime(d["timestamp"]))
-                .sort_values("timestamp")
-                .groupby("product", as_index=False)
-                .last()
-            )
-            for _, row in df_buyer.iterrows():
-                last_qty[row["product"]] = row["qty_desired"]
+        last_qty = {pid: h["qty_desired"] for pid, h in buyer_latest.items()}
 
         draft_products = {}
         total_qty_desired = 0
@@ -282,6 +266,60 @@ def buyer_app():
             )
             valid_input = False
 
+        # -----------------------------
+        # Estimation instantanée (une résolution LP par saisie et par état du
+        # carnet, gardée en session : les relances de l'attente d'une tâche
+        # ne la recalculent pas)
+        # -----------------------------
+        if valid_input:
+            user_qtys = {pid: prod["qty_desired"] for pid, prod in draft_products.items()}
+            user_prices = {pid: prod["current_price"] for pid, prod in draft_products.items()}
+            estimate_key = (
+                lot_id, bid_history_size(), buyer_id,
+                tuple(sorted((pid, user_qtys[pid], user_prices[pid]) for pid in draft_products))
+            )
+            cached = st.session_state.get("price_estimate")
+            if cached is None or cached["key"] != estimate_key:
+                cached = {
+                    "key": estimate_key,
+                    "estimates": simulate_optimal_bid(
+                        buyers_for_lot(CLEARING_SCHEDULER.book(lot_id), lot_products),
+                        list(lot_products.values()),
+                        user_qtys=user_qtys,
+                        user_prices=user_prices,
+                        new_buyer_name=buyer_id,
+                        mode="dual"
+                    ),
+                }
+                st.session_state.price_estimate = cached
+            estimates = cached["estimates"]
+            st.subheader("⚡ Prix estimé pour obtenir 100 %")
+            st.dataframe([
+                {
+                    "Produit": products[pid]["name"],
+                    "Prix estimé (€)": est["recommended_price"],
+                    "Fiabilité": "✅ fiable" if est["confident"] else "⚠️ à confirmer par simulation",
+                }
+                for pid, est in estimates.items()
+            ])
+
+            # Courbes prix -> quantité du lot (calculées une fois par état du carnet)
+            curves = PRICE_CURVES.curves(lot_id, exclude_buyer=buyer_id)
+            with st.expander("📈 Quantité obtenable selon le prix (indicatif)"):
+                st.caption(
+                    "Estimation sans MOQ produit ni MOQ globale : l'allocation réelle peut différer, "
+                    "la simulation donne le résultat exact."
+                )
+                for pid, prod in draft_products.items():
+                    curve = curves.get(pid, [])
+                    st.markdown(f"**{products[pid]['name']}**")
+                    st.caption(
+                        f"Au prix max saisi ({prod['max_price']:.2f} €) : "
+                        f"environ {curve_qty(curve, prod['max_price'])} unités obtenables"
+                    )
+                    if len(curve) > 1:
+                        st.line_chart(pd.DataFrame(curve).set_index("price")["qty"])
+
         # -----------------------------
         # Bouton simulation + recommandation
         # -----------------------------
@@ -292,116 +330,75 @@ def buyer_app():
             if not buyer_id:
                 st.warning("Renseigne d'abord ton identifiant acheteur")
             else:
-                buyers_copy = copy.deepcopy(st.session_state.buyers)
-
-                for buyer in buyers_copy:
-                    buyer["products"] = {
-                        pid: prod for pid, prod in buyer["products"].items()
-                        if pid in lot_products
-                    }
-
-                temp_buyer = {
-                    "name": "__SIMULATION__",
-                    "auto_bid": True,
-                    "products": copy.deepcopy(draft_products)
-                }
-                buyers_copy.append(temp_buyer)
-
-                buyers_copy_lot = []
-                for b in buyers_copy:
-                    filtered_products = {
-                        pid: p for pid, p in b["products"].items()
-                        if pid in lot_products
-                    }
-                    if filtered_products:
-                        buyers_copy_lot.append({
-                            "name": b["name"],
-                            "auto_bid": b.get("auto_bid", False),
-                            "products": filtered_products
-                        })
-
-                buyers_simulated = run_auto_bid_aggressive(
-                    buyers_copy_lot,
-                    list(lot_products.values()),
-                    max_rounds=30
+                st.session_state.simulation_job = JOB_RUNNER.submit(
+                    simulate_bid,
+                    CLEARING_SCHEDULER.book(lot_id),
+                    lot_products,
+                    draft_products,
+                    deadline_s=SIMULATION_DEADLINE_S,
+                    name="simulation"
                 )
+                st.session_state.simulation_draft = copy.deepcopy(draft_products)
 
-                allocations, _ = solve_model(
-                    buyers_simulated,
-                    list(lot_products.values())
-                )
+        simulation = job_result("simulation_job")
+        if simulation is not None:
+            sim_draft = st.session_state.simulation_draft
+            sim_alloc = simulation["allocations"]
 
-                sim_alloc = allocations["__SIMULATION__"]
+            sim_rows = []
+            total_desired_sim = 0
+            total_allocated_sim = 0
 
-                sim_rows = []
-                total_desired_sim = 0
-                total_allocated_sim = 0
+            for pid, prod in sim_draft.items():
+                qty_desired = prod["qty_desired"]
+                qty_allocated = sim_alloc.get(pid, 0)
 
-                for pid, prod in draft_products.items():
-                    qty_desired = prod["qty_desired"]
-                    qty_allocated = sim_alloc.get(pid, 0)
+                total_desired_sim += qty_desired
+                total_allocated_sim += qty_allocated
 
-                    total_desired_sim += qty_desired
-                    total_allocated_sim += qty_allocated
+                sim_rows.append({
+                    "Produit": products[pid]["name"],
+                    "Qté désirée": prod["qty_desired"],
+                    "Qté allouée": qty_allocated,
+                    "Prix courant simulé (€)": simulation["prices"][pid],
+                    "Prix max (€)": prod["max_price"]
+                })
 
-                    sim_rows.append({
-                        "Produit": products[pid]["name"],
-                        "Qté désirée": prod["qty_desired"],
-                        "Qté allouée": qty_allocated,
-                        "Prix courant simulé (€)": buyers_simulated[-1]["products"][pid]["current_price"],
-                        "Prix max (€)": prod["max_price"]
-                    })
+            if total_allocated_sim >= total_desired_sim and total_desired_sim > 0:
+                st.success(
+                    f"✅ Simulation : Allocation complète ({total_allocated_sim}/{total_desired_sim})"
+                )
+            else:
+                st.warning(
+                    f"⚠️ Simulation : Allocation partielle ({total_allocated_sim}/{total_desired_sim})"
+                )
 
-                if total_allocated_sim >= total_desired_sim and total_desired_sim > 0:
-                    st.success(
-                        f"✅ Simulation : Allocation complète ({total_allocated_sim}/{total_desired_sim})"
-                    )
-                else:
-                    st.warning(
-                        f"⚠️ Simulation : Allocation partielle ({total_allocated_sim}/{total_desired_sim})"
-                    )
+            solve_status = simulation.get("solve_status")
+            if solve_status and solve_status["status"] == "no_solution":
+                st.error(
+                    f"⏱️ Aucune allocation trouvée dans le délai ({solve_status['deadline_s']:.0f} s) : "
+                    "résultat de simulation non fiable, réessaie ou place l'enchère"
+                )
+            elif solve_status and solve_status["status"] != "optimal":
+                st.info(
+                    f"⏱️ Résultat au mieux en {solve_status['elapsed_s']:.1f} s "
+                    f"(écart à l'optimum ≤ {solve_status['gap']:.1%}"
+                    + (", auto-bid interrompu" if solve_status["truncated"] else "")
+                    + ") : le prix final à la clôture peut différer"
+                )
 
-                st.subheader("🧪 Résultat simulation allocation")
-                st.dataframe(sim_rows)
-
-                from core.recommendation import simulate_optimal_bid
-
-                buyers_copy_lot = []
-                for b in st.session_state.buyers:
-                    filtered_products = {
-                        pid: p for pid, p in b["products"].items()
-                        if pid in lot_products
-                    }
-                    if filtered_products:
-                        buyers_copy_lot.append({
-                            "name": b["name"],
-                            "auto_bid": b.get("auto_bid", False),
-                            "products": filtered_products
-                        })
+            st.subheader("🧪 Résultat simulation allocation")
+            st.dataframe(sim_rows)
 
-                buyers_copy_lot.append({
-                    "name": "__SIMULATION__",
-                    "auto_bid": True,
-                    "products": copy.deepcopy(draft_products)
+            rec_rows = []
+            for pid, rec in simulation["recommendations"].items():
+                rec_rows.append({
+                    "Produit": products[pid]["name"],
+                    "Prix recommandé pour 100% allocation (€)": rec["recommended_price"]
                 })
 
-                recs = simulate_optimal_bid(
-                    buyers_copy_lot,
-                    list(lot_products.values()),
-                    user_qtys={pid: prod["qty_desired"] for pid, prod in draft_products.items()},
-                    user_prices={pid: prod["current_price"] for pid, prod in draft_products.items()},
-                    new_buyer_name="__SIMULATION__"
-                )
-
-                rec_rows = []
-                for pid, rec in recs.items():
-                    rec_rows.append({
-                        "Produit": products[pid]["name"],
-                        "Prix recommandé pour 100% allocation (€)": rec["recommended_price"]
-                    })
-
-                st.subheader("💡 Recommandation prix pour obtenir 100% du stock")
-                st.dataframe(rec_rows)
+            st.subheader("💡 Recommandation prix pour obtenir 100% du stock")
+            st.dataframe(rec_rows)
 
         # -----------------------------
         # Bouton pour valider l'enchère
@@ -410,63 +407,97 @@ def buyer_app():
             "💰 Placer l’enchère pour tous les produits",
             disabled=not valid_input
         ):
+            # L'enchère rejoint le prochain tour de clôture du lot, regroupé
+            # avec celles des autres acheteurs arrivées entre-temps
+            ticket = CLEARING_SCHEDULER.submit_bid(lot_id, {
+                "name": buyer_id,
+                "products": draft_products,
+                "auto_bid": True
+            })
+            st.session_state.placement = {
+                "lot_id": lot_id,
+                "ticket": ticket,
+                "draft": copy.deepcopy(draft_products)
+            }
 
-            if not any(b["name"] == buyer_id for b in st.session_state.buyers):
-                st.session_state.buyers.append({
-                    "name": buyer_id,
-                    "products": copy.deepcopy(draft_products),
-                    "auto_bid": True
-                })
+        placement = st.session_state.get("placement")
+        if placement is not None:
+            outcome = CLEARING_SCHEDULER.outcome(placement["lot_id"], placement["ticket"])
+            if outcome is None:
+                status = CLEARING_SCHEDULER.status(placement["lot_id"])
+                progress = status["job"]["progress"] if status["job"] else {"rounds": 0, "solves": 0}
+                st.info(
+                    f"⏳ Clôture du lot en cours (tour {placement['ticket']}, "
+                    f"{status['pending']} enchère(s) en attente)… "
+                    f"{progress['rounds']} tours d'auto-bid, {progress['solves']} résolutions"
+                )
             else:
-                for b in st.session_state.buyers:
-                    if b["name"] == buyer_id:
-                        b["products"] = copy.deepcopy(draft_products)
-                        b["auto_bid"] = True
-
-            buyers_for_lot = []
-            for b in st.session_state.buyers:
-                filtered_products = {
-                    pid: p for pid, p in b["products"].items()
-                    if pid in lot_products
-                }
-                if filtered_products:
-                    buyers_for_lot.append({
-                        "name": b["name"],
-                        "auto_bid": b.get("auto_bid", False),
-                        "products": filtered_products
-                    })
-
-            st.session_state.buyers = run_auto_bid_aggressive(
-                buyers_for_lot,
-                list(lot_products.values())
-            )
-
-            allocations, _ = solve_model(
-                st.session_state.buyers,
-                list(lot_products.values())
-            )
-
-            save_final_allocations(
-                st.session_state.buyers,
-                allocations,
-                lot_id,
-                seller_id
-            )
-
-            buyer_alloc = allocations.get(buyer_id, {})
+                del st.session_state.placement
+                if outcome["error"] is not None:
+                    st.error(
+                        f"La clôture a échoué : {outcome['error']}. "
+                        f"Ton enchère reste au carnet du lot et sera reprise au prochain tour."
+                    )
+                else:
+                    buyer_alloc = outcome["allocations"].get(buyer_id, {})
+                    final_buyer = next(b for b in outcome["buyers"] if b["name"] == buyer_id)
+
+                    result_rows = []
+                    for pid, prod in placement["draft"].items():
+                        result_rows.append({
+                            "Produit": products[pid]["name"],
+                            "Qté demandée": prod["qty_desired"],
+                            "Qté allouée": buyer_alloc.get(pid, 0),
+                            "Prix final (€)": final_buyer["products"][pid]["current_price"]
+                        })
 
-            result_rows = []
-            for pid, prod in draft_products.items():
-                result_rows.append({
-                    "Produit": products[pid]["name"],
-                    "Qté demandée": prod["qty_desired"],
-                    "Qté allouée": buyer_alloc.get(pid, 0),
-                    "Prix final (€)": next(
-                        b for b in st.session_state.buyers
-                        if b["name"] == buyer_id
-                    )["products"][pid]["current_price"]
-                })
+                    st.subheader("✅ Allocation finale du stock")
+                    st.dataframe(result_rows)
+                    st.success(
+                        f"Marché clôturé : allocation finale calculée et enregistrée "
+                        f"(tour {outcome['round']}, {outcome['bids']} enchère(s) regroupée(s))"
+                    )
 
-            st.subheader("✅ Allocation finale du stock")
-            st.dataframe(result_rows)
-            st.success("Marché clôturé : allocation finale calculée et enregistrée")
+        # Relance la page tant qu'une tâche de fond tourne
+        if any(key in st.session_state for key in ("simulation_job", "placement")):
+            time.sleep(JOB_POLL_INTERVAL_S)
+            st.rerun()
+
+
+def job_result(key):
+    """
+    Suit la tâche de fond dont l'id est dans st.session_state[key] :
+    affiche sa progression tant qu'elle tourne, puis renvoie son résultat
+    une seule fois. None si aucune tâche n'est terminée.
+    """
+    job_id = st.session_state.get(key)
+    if job_id is None:
+        return None
+
+    status = JOB_RUNNER.status(job_id)
+    if status is None:
+        del st.session_state[key]
+        st.warning("Ce calcul a expiré, relance-le.")
+        return None
+    if status["state"] in ("pending", "running"):
+        progress = status["progress"]
+        col_info, col_cancel = st.columns([4, 1])
+        col_info.info(
+            f"⏳ Calcul en cours… {progress['rounds']} tours d'auto-bid, "
+            f"{progress['solves']} résolutions"
+        )
+        if col_cancel.button("Annuler", key=f"cancel_{key}"):
+            JOB_RUNNER.cancel(job_id)
+        return None
+
+    del st.session_state[key]
+    if status["state"] == "cancelled":
+        st.info("Calcul annulé.")
+        result = None
+    elif status["state"] == "failed":
+        st.error(f"Le calcul a échoué : {status['error']}")
+        result = None
+    else:
+        result = JOB_RUNNER.result(job_id)
+    JOB_RUNNER.forget(job_id)
+    return result
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from services.state_manager import load_json
+from services.bid_aggregates import lot_summary
+from services.bid_history import load_bid_history
 
 def seller_app():
     st.title("Dashboard Vendeur")
@@ -9,7 +11,6 @@ def seller_app():
     # Charger les données
     # -----------------------------
     products = load_json("products.json")
-    history = load_json("bids_history.json")
     lots = load_json("lots.json")
 
     # -----------------------------
@@ -55,20 +56,13 @@ def seller_app():
             })
         st.table(pd.DataFrame(product_summary))
 
+    # Agrégats du lot (dernier tour par produit, CA), tenus à jour par bid_service
+    summary = lot_summary(lot_id)
+
     # -----------------------------
     # Chiffre d'affaires total pour ce lot
     # -----------------------------
-    total_ca = 0
-    for pid, p in lot_products.items():
-        product_history = [h for h in history if h["product"] == pid]
-        if product_history:
-            latest_time = max(h["timestamp"] for h in product_history)
-            last_allocations = [
-                h for h in product_history 
-                if h["timestamp"] == latest_time and h["qty_allocated"] > 0
-            ]
-            for h in last_allocations:
-                total_ca += h["final_price"] * h["qty_allocated"]
+    total_ca = summary["total_ca"]
 
     st.markdown(f"## 💵 Chiffre d'affaires total pour ce lot : {total_ca:.2f} €")
     st.markdown("---")
@@ -77,11 +71,8 @@ def seller_app():
     # Évolution du chiffre d'affaires
     # -----------------------------
     with st.expander("📈 Évolution du chiffre d'affaires (lot sélectionné)"):
-        df = pd.DataFrame([h for h in history if h["lot_id"] == lot_id])
-        if not df.empty:
-            df["ca"] = df["final_price"] * df["qty_allocated"]
-            df_ca_global = df.groupby("timestamp")["ca"].sum().reset_index()
-            df_ca_global = df_ca_global.sort_values("timestamp")
+        df_ca_global = pd.DataFrame(summary["revenue_by_round"], columns=["timestamp", "ca"])
+        if not df_ca_global.empty:
             df_ca_global["short_date"] = pd.to_datetime(df_ca_global["timestamp"]).dt.strftime("%d/%m %H:%M")
             st.dataframe(df_ca_global)
             st.line_chart(df_ca_global.set_index("short_date")["ca"])
@@ -94,24 +85,18 @@ def seller_app():
     st.subheader("**📊 Enchères en cours (lot sélectionné)**")
     rows = []
     for pid, p in lot_products.items():
-        product_history = [h for h in history if h["product"] == pid]
-        if product_history:
-            latest_time = max(h["timestamp"] for h in product_history)
-            last_allocations = [
-                h for h in product_history 
-                if h["timestamp"] == latest_time and h["qty_allocated"] > 0
-            ]
-            for h in last_allocations:
-                rows.append({
-                    "Produit": p["name"],
-                    "Acheteur": h["buyer"],
-                    "Qté allouée": h["qty_allocated"],
-                    "Prix final (€)": h["final_price"],
-                    "Qté demandée": h["qty_desired"],
-                    "Prix max (€)": h["max_price"],
-                    "Chiffre d'affaires (€)": h["final_price"] * h["qty_allocated"],
-                    "Date": h["timestamp"]
-                })
+        last_allocations = [h for h in summary["latest_round"].get(pid, []) if h["qty_allocated"] > 0]
+        for h in last_allocations:
+            rows.append({
+                "Produit": p["name"],
+                "Acheteur": h["buyer"],
+                "Qté allouée": h["qty_allocated"],
+                "Prix final (€)": h["final_price"],
+                "Qté demandée": h["qty_desired"],
+                "Prix max (€)": h["max_price"],
+                "Chiffre d'affaires (€)": h["final_price"] * h["qty_allocated"],
+                "Date": h["timestamp"]
+            })
     if rows:
         st.dataframe(pd.DataFrame(rows))
     else:
@@ -123,7 +108,7 @@ def seller_app():
     with st.expander("📜 Historique complet des enchères (lot sélectionné)"):
         hist_rows = []
         for pid, p in lot_products.items():
-            product_history = [h for h in history if h["product"] == pid]
+            product_history = load_bid_history(lot_id=lot_id, product=pid)
             for h in product_history:
                 hist_rows.append({
                     "Produit": p["name"],